@@ -4,22 +4,23 @@ from .core import process_agent_prompt  # assume this handles prompt constructio
 from .brain import reddit_post_from_instruction  # optionally splits logic
 from .scripts.vector_indexer import retrieve_context
 import json
-import praw  # or other Reddit API wrapper
+from functools import lru_cache
 
 # Load configuration
 AGENT_SUBREDDIT = os.getenv("TARGET_SUBREDDIT", "MachineLearning")
 MAX_CONTEXT = int(os.getenv("MAX_CONTEXT", 3))
 
-# Initialize Reddit API client
-reddit = praw.Reddit(
-    client_id=os.getenv("REDDIT_CLIENT_ID"),
-    client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
-    username=os.getenv("REDDIT_USERNAME"),
-    password=os.getenv("REDDIT_PASSWORD"),
-    user_agent=os.getenv("REDDIT_USER_AGENT", "agent1 (by u/unknown)")
-)
-
-from praw.exceptions import RedditAPIException
+@lru_cache(maxsize=None)
+def get_reddit():
+    """Reddit API client, created on first use so importing this module stays cheap."""
+    import praw  # or other Reddit API wrapper
+    return praw.Reddit(
+        client_id=os.getenv("REDDIT_CLIENT_ID"),
+        client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
+        username=os.getenv("REDDIT_USERNAME"),
+        password=os.getenv("REDDIT_PASSWORD"),
+        user_agent=os.getenv("REDDIT_USER_AGENT", "agent1 (by u/unknown)")
+    )
 
 def fetch_submission_flairs(reddit, sub_name: str):
     """Return [{'id': ..., 'text': ...}, ...] for submission (link) flairs."""
@@ -76,8 +77,10 @@ def main():
 
     # accept either a single dict or a list of bundles
     if isinstance(data, list):
-        # pick the first bundle for the target subreddit, prefer a post over a comment
-        bundle = next((b for b in data if b.get("subreddit") == AGENT_SUBREDDIT and b.get("type") == "post"), None)
+        # pick the target subreddit's post with the highest engagement velocity (triage --top_k
+        # writes bundles best first, so without velocities this is the first post)
+        posts = [b for b in data if b.get("subreddit") == AGENT_SUBREDDIT and b.get("type") == "post"]
+        bundle = max(posts, key=lambda b: b.get("velocity") or 0, default=None)
         bundle = bundle or data[0]
     else:
         bundle = data
@@ -125,6 +128,8 @@ def main():
     else: # No URL or Reddit internal URL, make it a self-post
         post_params["selftext"] = output["body"]
 
+    from praw.exceptions import RedditAPIException
+    reddit = get_reddit()
     try:
         submission = reddit.subreddit(AGENT_SUBREDDIT).submit(**post_params)
     except RedditAPIException as e:
@@ -1,12 +1,18 @@
 # agents/brain.py
 
-import openai
+import asyncio
 import os
+import threading
 from dotenv import load_dotenv; load_dotenv()
 os.environ.setdefault("OPENAI_API_KEY", os.getenv("OPEN_AI_KEY", ""))
-import requests
 import yaml
 import json
+import time
+from functools import lru_cache
+import http_client
+from llm_cache import get_cache
+from prompt_packer import estimate_tokens
+from rate_limit import TokenBucket
 
 def load_config(path='mcp_config.yaml'):
     """Loads the configuration file."""
@@ -14,8 +20,16 @@ def load_config(path='mcp_config.yaml'):
     with open(path, 'r') as f:
         return yaml.safe_load(f)
 
-# Load the config once when the module is imported
-CONFIG = load_config()
+@lru_cache(maxsize=None)
+def get_config():
+    """Loads the config on first use and keeps it for the life of the process."""
+    return load_config()
+
+def __getattr__(name):
+    # `brain.CONFIG` still works for callers, without reading the YAML at import time
+    if name == 'CONFIG':
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def _resolve_api_key(api_key_setting):
     """Resolves the API key from environment variables."""
@@ -28,7 +42,16 @@ def _resolve_api_key(api_key_setting):
     return api_key_setting
 
 def ask_claude(prompt, model_name, api_key):
-    """Sends a request to the Anthropic Claude API."""
+    """Sends a request to the Anthropic Claude API, reusing cached replies to identical prompts."""
+    max_tokens = get_config()['models'][model_name].get('max_tokens', 4000)
+    cached = get_cache().get(model_name, max_tokens, prompt)
+    if cached is not None:
+        return cached
+    return _post_claude(prompt, model_name, api_key)
+
+def _post_claude(prompt, model_name, api_key):
+    """Sends a request to the Anthropic Claude API and caches the reply, without a cache lookup."""
+    max_tokens = get_config()['models'][model_name].get('max_tokens', 4000)
     headers = {
         "x-api-key": api_key,
         "anthropic-version": "2023-06-01",
@@ -36,15 +59,19 @@ def ask_claude(prompt, model_name, api_key):
     }
     payload = {
         "model": model_name,
-        "max_tokens": CONFIG['models'][model_name].get('max_tokens', 4000),
+        "max_tokens": max_tokens,
         "messages": [{"role": "user", "content": prompt}]
     }
-    response = requests.post("https://api.anthropic.com/v1/messages", json=payload, headers=headers)
+    response = http_client.post("https://api.anthropic.com/v1/messages", json=payload, headers=headers,
+                                 timeout=(http_client.HTTP_CONNECT_TIMEOUT, 120))
     response.raise_for_status()
-    return response.json()["content"][0]["text"]
+    text = response.json()["content"][0]["text"]
+    get_cache().put(model_name, max_tokens, prompt, text)
+    return text
 
 def ask_openai(prompt, model_name, api_key):
     """Sends a request to the OpenAI API."""
+    import openai  # deferred: only needed when an OpenAI model is actually used
     openai.api_key = api_key
     response = openai.ChatCompletion.create(
         model=model_name,
@@ -52,25 +79,114 @@ def ask_openai(prompt, model_name, api_key):
     )
     return response.choices[0].message.content
 
+class ProviderLimits:
+    """Concurrency cap plus request/token buckets for one provider, from `rate_limits` in the config"""
+
+    def __init__(self, settings):
+        rpm = settings.get('requests_per_minute')
+        tpm = settings.get('tokens_per_minute')
+        self.max_concurrency = int(settings.get('max_concurrency', 4))
+        self.requests = TokenBucket.per_minute(rpm) if rpm else None
+        self.tokens = TokenBucket.per_minute(tpm) if tpm else None
+        self.slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._async_slots = {}
+
+    def reserve(self, tokens):
+        """Book one request and `tokens` tokens; returns the seconds to wait before sending."""
+        delay = 0.0
+        if self.requests:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    def async_slots(self):
+        # asyncio semaphores belong to one event loop, so keep one per running loop
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_slots:
+            self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._async_slots[loop]
+
+_limits = {}
+_limits_lock = threading.Lock()
+
+def _provider_limits(provider):
+    with _limits_lock:
+        if provider not in _limits:
+            _limits[provider] = ProviderLimits(get_config().get('rate_limits', {}).get(provider, {}))
+        return _limits[provider]
+
+def _resolve_model(model):
+    model_config = get_config()['models'].get(model)
+    if not model_config:
+        raise ValueError(f"Model '{model}' not found in mcp_config.yaml.")
+
+    provider = model_config.get('provider')
+    if provider not in ('anthropic', 'openai'):
+        raise ValueError(f"Unsupported provider: '{provider}' for model '{model}'.")
+    api_key = _resolve_api_key(model_config.get('api_key'))
+    # The largest possible reply counts against a token limit along with the prompt
+    reply_tokens = model_config.get('max_tokens', 4000)
+    return provider, api_key, reply_tokens
+
+def _cached_reply(prompt, model, provider):
+    """A cached reply to this exact prompt, if any; these cost no rate-limit budget."""
+    if provider != 'anthropic':
+        return None
+    max_tokens = get_config()['models'][model].get('max_tokens', 4000)
+    return get_cache().get(model, max_tokens, prompt)
+
+def _dispatch(prompt, model, provider, api_key, limits):
+    with limits.slots:
+        if provider == 'anthropic':
+            # ask_model already looked the prompt up in the cache
+            return _post_claude(prompt, model, api_key)
+        return ask_openai(prompt, model, api_key)
+
 def ask_model(prompt, model):
     """
     Determines the correct provider for the given model and calls it.
     The 'model' argument is the key from the 'models' section in the config.
     e.g., "claude-3-opus"
+    Calls are throttled by the provider's `rate_limits` entry in the config;
+    cached replies are returned before any budget is reserved.
     """
-    model_config = CONFIG['models'].get(model)
-    if not model_config:
-        raise ValueError(f"Model '{model}' not found in mcp_config.yaml.")
+    provider, api_key, reply_tokens = _resolve_model(model)
+    cached = _cached_reply(prompt, model, provider)
+    if cached is not None:
+        return cached
+    limits = _provider_limits(provider)
+    delay = limits.reserve(estimate_tokens(prompt) + reply_tokens)
+    if delay > 0:
+        time.sleep(delay)
+    return _dispatch(prompt, model, provider, api_key, limits)
 
-    provider = model_config.get('provider')
-    api_key = _resolve_api_key(model_config.get('api_key'))
+async def ask_model_async(prompt, model):
+    """
+    Async variant of ask_model: waits for rate-limit budget without blocking the event loop,
+    then runs the provider call in a worker thread. Shares limits with synchronous callers.
+    """
+    provider, api_key, reply_tokens = _resolve_model(model)
+    cached = await asyncio.to_thread(_cached_reply, prompt, model, provider)
+    if cached is not None:
+        return cached
+    limits = _provider_limits(provider)
+    async with limits.async_slots():
+        delay = limits.reserve(estimate_tokens(prompt) + reply_tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return await asyncio.to_thread(_dispatch, prompt, model, provider, api_key, limits)
 
-    if provider == 'anthropic':
-        return ask_claude(prompt, model, api_key)
-    elif provider == 'openai':
-        return ask_openai(prompt, model, api_key)
-    else:
-        raise ValueError(f"Unsupported provider: '{provider}' for model '{model}'.")
+async def ask_many(prompts, model, return_exceptions=False):
+    """
+    Fans a batch of prompts out to the model concurrently, within the provider's limits.
+    Results come back in prompt order; with return_exceptions=True failures are returned
+    in place instead of cancelling the batch.
+    """
+    return await asyncio.gather(
+        *(ask_model_async(prompt, model) for prompt in prompts),
+        return_exceptions=return_exceptions
+    )
 
 def reddit_post_from_instruction(instruction_dict):
     """
@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
-import os, json, argparse, time
+import os, json, argparse, time, threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 import praw
+try:
+    from .payload_io import PayloadWriter
+except ImportError:  # run as a script from agents/scripts
+    from payload_io import PayloadWriter
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -15,6 +20,13 @@ DEFAULT_SUBS = [
     "lectures"
 ]
 
+FETCH_CONCURRENCY = int(os.getenv("REDDIT_FETCH_CONCURRENCY", 4))
+RATE_LIMIT_RESERVE = int(os.getenv("REDDIT_RATE_RESERVE", 5))  # requests left unspent per window
+COMMENT_POSTS = 10      # submissions per subreddit whose comments are harvested
+COMMENT_LIMIT = 15      # comments kept per submission
+STATE_PATH = os.getenv("REDDIT_STATE_PATH", "data/fetch_state.json")
+REFRESH_HOURS = 24      # how long fetched items stay eligible for --refresh_scores
+
 def get_reddit():
     return praw.Reddit(
         client_id=os.getenv("REDDIT_CLIENT_ID"),
@@ -26,7 +38,65 @@ def get_reddit():
 
 from prawcore.exceptions import NotFound, Forbidden, Redirect, ResponseException, RequestException
 
-def try_hot(sr_name, limit, mode):
+# praw.Reddit is not thread-safe, so each worker thread gets its own client
+_local = threading.local()
+
+def get_thread_reddit():
+    if getattr(_local, "reddit", None) is None:
+        _local.reddit = get_reddit()
+    return _local.reddit
+
+class RateLimitScheduler:
+    """
+    Shares Reddit's per-account request budget across worker threads. Each praw client
+    only sees the X-Ratelimit-Remaining / X-Ratelimit-Reset headers of its own responses,
+    so after every call the client's prawcore limiter is folded into one shared view, and
+    callers block once the remaining budget would drop below the reserve.
+    """
+
+    def __init__(self, reserve=RATE_LIMIT_RESERVE):
+        self.reserve = reserve
+        self.remaining = None
+        self.reset_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def acquire(self, cost=1):
+        while True:
+            with self._lock:
+                now = time.time()
+                if self.reset_at is not None and now >= self.reset_at:
+                    self.remaining, self.reset_at = None, None
+                if self.remaining is None:
+                    # Budget unknown (first call, or a new window): let one request through
+                    # to read the headers and hold the rest until it reports back
+                    if not self._probing:
+                        self._probing = True
+                        return
+                    wait = 0.05
+                elif self.remaining - cost >= self.reserve:
+                    self.remaining -= cost
+                    return
+                else:
+                    wait = self.reset_at - now
+            time.sleep(min(wait, 10))
+
+    def observe(self, reddit):
+        limiter = reddit._core._rate_limiter
+        with self._lock:
+            self._probing = False
+            if limiter.remaining is None or limiter.reset_timestamp is None:
+                return
+            if self.reset_at is None or limiter.reset_timestamp > self.reset_at + 1:
+                self.remaining, self.reset_at = limiter.remaining, limiter.reset_timestamp
+            else:
+                # Same window: other threads may have spent more since this response
+                self.remaining = min(self.remaining, limiter.remaining)
+
+def try_hot(sr_name, limit, mode, reddit=None, scheduler=None):
+    reddit = reddit or get_thread_reddit()
+    if scheduler:
+        scheduler.acquire(cost=max(1, -(-limit // 100)))  # listings page 100 items per request
     try:
         sr = reddit.subreddit(sr_name)
         it = getattr(sr, mode)(limit=limit)
@@ -35,6 +105,223 @@ def try_hot(sr_name, limit, mode):
         return [], f"{sr_name}: {e.__class__.__name__} (private/quarantined/missing?)"
     except (ResponseException, RequestException) as e:
         return [], f"{sr_name}: API/network error: {type(e).__name__}"
+    finally:
+        if scheduler:
+            scheduler.observe(reddit)
+
+def fetch_listing(sub, limit, mode, scheduler=None):
+    """One subreddit's listing on this thread's client, as (sub, posts, err, seconds)."""
+    start = time.perf_counter()
+    posts, err = try_hot(sub, limit, mode, scheduler=scheduler)
+    return sub, posts, err, time.perf_counter() - start
+
+def post_to_item(s):
+    return {
+        "id": s.id,
+        "subreddit": str(s.subreddit),
+        "type": "post",
+        "title": s.title or "",
+        "selftext": s.selftext or "",
+        "url": s.url if (s.url and not s.is_self) else None,
+        "score": int(s.score or 0),
+        "num_comments": int(s.num_comments or 0),
+        "created_utc": int(s.created_utc or 0)
+    }
+
+def comment_to_item(c, subreddit):
+    return {
+        "id": c.id,
+        "subreddit": subreddit,
+        "type": "comment",
+        "title": None,
+        "body": c.body or "",
+        "url": f"https://www.reddit.com{c.permalink}",
+        "score": int(c.score or 0),
+        "num_comments": 0,
+        "created_utc": int(c.created_utc or 0)
+    }
+
+def walk_comments(forest, limit, depth):
+    """Comments breadth-first down to `depth` levels (1 = top-level only), at most `limit` of them."""
+    out, level = [], list(forest)
+    for _ in range(max(1, depth)):
+        nxt = []
+        for c in level:
+            if len(out) >= limit:
+                return out
+            out.append(c)
+            nxt.extend(c.replies)
+        level = nxt
+    return out
+
+def fetch_comment_forest(subreddit, sid, limit=COMMENT_LIMIT, depth=1, replace_more=0, scheduler=None):
+    """One submission's comments on this thread's client, as (items, err)."""
+    scheduler = scheduler or RateLimitScheduler()
+    reddit = get_thread_reddit()
+    scheduler.acquire(cost=1 + max(0, replace_more or 0))
+    try:
+        submission = reddit.submission(id=sid)
+        submission.comments.replace_more(limit=replace_more)
+        return [comment_to_item(c, subreddit) for c in walk_comments(submission.comments, limit, depth)], None
+    except (NotFound, Forbidden, Redirect, ResponseException, RequestException) as e:
+        return [], f"{subreddit}/{sid} comments: {type(e).__name__}"
+    finally:
+        scheduler.observe(reddit)
+
+def write_listings(payload, subs, limit, mode, with_comments=False, comment_posts=COMMENT_POSTS,
+                   comment_limit=COMMENT_LIMIT, comment_depth=1, replace_more=0,
+                   max_workers=FETCH_CONCURRENCY, scheduler=None):
+    """
+    Fetches listings and comment forests on one pool and writes each subreddit's posts, and
+    each submission's comments, to `payload` as soon as they arrive. Returns the errors.
+    """
+    scheduler = scheduler or RateLimitScheduler()
+    # Comments are always harvested from hot; in hot mode the listing already holds the
+    # submissions, so comments come from (at most) the posts it returned
+    reuse_listing = mode == "hot"
+    if reuse_listing:
+        comment_posts = min(comment_posts, limit)
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        pending = {pool.submit(fetch_listing, sub, limit, mode, scheduler): "listing" for sub in subs}
+        if with_comments and not reuse_listing:
+            pending.update({pool.submit(fetch_listing, sub, comment_posts, "hot", scheduler): "comment_sources"
+                            for sub in subs})
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind = pending.pop(future)
+                if kind == "comments":
+                    comments, err = future.result()
+                    payload.write_many(comments)
+                    if err:
+                        errors.append(err)
+                    continue
+                sub, posts, err, seconds = future.result()
+                if kind == "listing":
+                    print(f"r/{sub}: {len(posts)} posts in {seconds:.2f}s" + (f" ({err})" if err else ""))
+                    payload.write_many(post_to_item(s) for s in posts if not getattr(s, "stickied", False))
+                if err:
+                    errors.append(err)
+                    continue
+                if with_comments and (kind == "comment_sources" or reuse_listing):
+                    pending.update({
+                        pool.submit(fetch_comment_forest, sub, s.id, limit=comment_limit, depth=comment_depth,
+                                    replace_more=replace_more, scheduler=scheduler): "comments"
+                        for s in posts[:comment_posts]
+                    })
+    return errors
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(state, path=STATE_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def iter_until_known(listing, mark, recent, reddit, scheduler):
+    """
+    Yields items of a newest-first listing until the high-watermark `mark` is reached.
+    Items already in `recent` are skipped. Listings page 100 items per request, so a
+    rate-limit slot is reserved before, and the headers observed after, every 100th item.
+    """
+    it = iter(listing)
+    n = 0
+    while True:
+        page_boundary = n % 100 == 0
+        if page_boundary:
+            scheduler.acquire()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        finally:
+            if page_boundary:
+                scheduler.observe(reddit)
+        n += 1
+        if mark and (item.fullname == mark["fullname"] or int(item.created_utc or 0) < mark["created_utc"]):
+            return
+        if item.fullname not in recent:
+            yield item
+
+def fetch_new_since(sub, sub_state, limit, with_comments, scheduler):
+    """
+    Pages r/sub/new (and r/sub/comments with `with_comments`) only until the stored
+    high-watermarks, updating `sub_state` in place. Without a watermark the first `limit`
+    items seed it. Returns (sub, items, err, seconds).
+    """
+    reddit = get_thread_reddit()
+    start = time.perf_counter()
+    recent = sub_state.setdefault("recent", {})
+    items = []
+    try:
+        sr = reddit.subreddit(sub)
+        kinds = [("posts", sr.new, post_to_item)]
+        if with_comments:
+            kinds.append(("comments", sr.comments, lambda c: comment_to_item(c, sub)))
+        for kind, listing, to_item in kinds:
+            mark = sub_state.get(kind)
+            fresh = list(iter_until_known(listing(limit=None if mark else limit), mark, recent, reddit, scheduler))
+            if fresh:
+                newest = max(fresh, key=lambda x: x.created_utc or 0)
+                sub_state[kind] = {"fullname": newest.fullname, "created_utc": int(newest.created_utc or 0)}
+            for x in fresh:
+                if getattr(x, "stickied", False):
+                    continue
+                item = to_item(x)
+                recent[x.fullname] = [item["created_utc"], item["score"], item["num_comments"]]
+                items.append(item)
+        return sub, items, None, time.perf_counter() - start
+    except (NotFound, Forbidden, Redirect) as e:
+        return sub, items, f"{sub}: {e.__class__.__name__} (private/quarantined/missing?)", time.perf_counter() - start
+    except (ResponseException, RequestException) as e:
+        return sub, items, f"{sub}: API/network error: {type(e).__name__}", time.perf_counter() - start
+
+def prune_recent(state, hours=REFRESH_HOURS):
+    cutoff = time.time() - hours * 3600
+    for sub_state in state.values():
+        recent = sub_state.get("recent", {})
+        for name in [n for n, (created, _, _) in recent.items() if created < cutoff]:
+            del recent[name]
+
+def refresh_scores(state, hours=REFRESH_HOURS, scheduler=None):
+    """
+    Re-reads score and comment count of items fetched in the last `hours` via
+    reddit.info (100 fullnames per request) and returns the ones that changed.
+    """
+    scheduler = scheduler or RateLimitScheduler()
+    prune_recent(state, hours)
+    recent_by_name = {}
+    for sub, sub_state in state.items():
+        recent = sub_state.get("recent", {})
+        for name in recent:
+            recent_by_name[name] = (sub, recent)
+    if not recent_by_name:
+        return []
+
+    reddit = get_thread_reddit()
+    updated = []
+    names = list(recent_by_name)
+    for i in range(0, len(names), 100):
+        scheduler.acquire()
+        try:
+            things = list(reddit.info(fullnames=names[i:i + 100]))
+        finally:
+            scheduler.observe(reddit)
+        for thing in things:
+            sub, recent = recent_by_name[thing.fullname]
+            item = post_to_item(thing) if thing.fullname.startswith("t3_") else comment_to_item(thing, sub)
+            snapshot = [item["created_utc"], item["score"], item["num_comments"]]
+            if recent[thing.fullname] != snapshot:
+                recent[thing.fullname] = snapshot
+                updated.append(item)
+    return updated
 
 
 if __name__ == "__main__":
@@ -43,53 +330,60 @@ if __name__ == "__main__":
     ap.add_argument("--post_limit", type=int, default=30)
     ap.add_argument("--mode", choices=["hot","new","top"], default="hot")
     ap.add_argument("--with_comments", action="store_true")
-    ap.add_argument("--output", default="data/reddit_payload.json")
+    ap.add_argument("--comment_posts", type=int, default=COMMENT_POSTS, help="submissions per subreddit to harvest comments from")
+    ap.add_argument("--comment_limit", type=int, default=COMMENT_LIMIT, help="comments kept per submission")
+    ap.add_argument("--comment_depth", type=int, default=1, help="reply levels to walk (1 = top-level only)")
+    ap.add_argument("--replace_more", type=int, default=0, help='"load more comments" expansions per submission (-1 = all)')
+    ap.add_argument("--output", default="data/reddit_payload.json",
+                    help=".json array, or .jsonl[.gz|.zst] written line by line so downstream stages can follow it")
+    ap.add_argument("--max_workers", type=int, default=FETCH_CONCURRENCY)
+    ap.add_argument("--incremental", action="store_true",
+                    help="page new listings only down to each subreddit's high-watermark and emit only new items")
+    ap.add_argument("--refresh_scores", action="store_true",
+                    help="with --incremental, also emit recently fetched items whose score or comment count changed")
+    ap.add_argument("--refresh_hours", type=float, default=REFRESH_HOURS)
+    ap.add_argument("--state", default=STATE_PATH)
     args = ap.parse_args()
 
     os.makedirs("data", exist_ok=True)
-    reddit = get_reddit()
-
-    payload, skips = [], []
-    for sub in args.subs:
-        posts, err = try_hot(sub, args.post_limit, args.mode)
-        if err:
-            skips.append(err); continue
-        for s in posts:
-            if getattr(s, "stickied", False):
-                continue
-            payload.append({
-                "id": s.id,
-                "subreddit": str(s.subreddit),
-                "type": "post",
-                "title": s.title or "",
-                "selftext": s.selftext or "",
-                "url": s.url if (s.url and not s.is_self) else None,
-                "score": int(s.score or 0),
-                "num_comments": int(s.num_comments or 0),
-                "created_utc": int(s.created_utc or 0)
-            })
-        if args.with_comments:
-            # light pause to be polite to API
-            time.sleep(0.5)
-            comments, err = try_hot(sub, min(10, args.post_limit), "hot") # comments are always hot
-            if err:
-                skips.append(err); continue
-            for s in comments:
-                s.comments.replace_more(limit=0)
-                for c in s.comments[:15]: # comment_limit=15
-                    payload.append({
-                        "id": c.id,
-                        "subreddit": str(s.subreddit),
-                        "type": "comment",
-                        "title": None,
-                        "body": c.body or "",
-                        "url": f"https://www.reddit.com{c.permalink}",
-                        "score": int(c.score or 0),
-                        "num_comments": 0,
-                        "created_utc": int(c.created_utc or 0)
-                    })
-    print("Skipped:", skips)
+    scheduler = RateLimitScheduler()
+    replace_more = None if args.replace_more < 0 else args.replace_more
+
+    skips = []
+    started = time.perf_counter()
+    # Items are written as each subreddit or comment forest arrives, so `--follow` readers
+    # downstream can start right away; the previous payload is only replaced on success
+    with PayloadWriter(args.output) as payload:
+        if args.incremental:
+            state = load_state(args.state)
+            updated = []
+            if args.refresh_scores:
+                # Before fetching, so only items from earlier runs are re-read
+                updated = refresh_scores(state, args.refresh_hours, scheduler=scheduler)
+            prune_recent(state, args.refresh_hours)
+            with ThreadPoolExecutor(max_workers=max(1, args.max_workers)) as pool:
+                futures = [pool.submit(fetch_new_since, sub, state.setdefault(sub, {}), args.post_limit,
+                                       args.with_comments, scheduler)
+                           for sub in args.subs]
+                for future in as_completed(futures):
+                    sub, items, err, seconds = future.result()
+                    print(f"r/{sub}: {len(items)} new items in {seconds:.2f}s" + (f" ({err})" if err else ""))
+                    if err:
+                        skips.append(err)
+                    payload.write_many(items)
+            if updated:
+                print(f"Refreshed scores: {len(updated)} items changed")
+            payload.write_many(updated)
+        else:
+            skips.extend(write_listings(payload, args.subs, args.post_limit, args.mode,
+                                        with_comments=args.with_comments, comment_posts=args.comment_posts,
+                                        comment_limit=args.comment_limit, comment_depth=args.comment_depth,
+                                        replace_more=replace_more, max_workers=args.max_workers,
+                                        scheduler=scheduler))
+        print(f"Fetched {len(args.subs)} subreddits in {time.perf_counter() - started:.2f}s")
+        print("Skipped:", skips)
 
-    with open(args.output, "w") as f:
-        json.dump(payload, f, indent=2)
-    print(f"Wrote {len(payload)} items to {args.output}")
\ No newline at end of file
+    if args.incremental:
+        # Only advance the watermarks once the items behind them are safely written
+        save_state(state, args.state)
+    print(f"Wrote {payload.count} items to {args.output}")
\ No newline at end of file
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+
+NEAR_DUP_INDEX_PATH = os.getenv("NEAR_DUP_INDEX_PATH", ".cache/near_dup.db")
+NEAR_DUP_MAX_DISTANCE = int(os.getenv("NEAR_DUP_MAX_DISTANCE", 6))  # Hamming bits between near-duplicates
+SHINGLE_SIZE = 1  # words; short Reddit texts shift too many bits under longer shingles
+SIMHASH_BITS = 64
+BANDS, BAND_BITS = 7, 9  # by pigeonhole, signatures up to BANDS - 1 bits apart share a band exactly
+COMMIT_EVERY = 500
+
+_TOKEN = re.compile(r"\w+")
+_URL = re.compile(r"https?://\S+")
+
+def features(text):
+    """Word shingles of lowercased text with URLs removed (single words for very short texts)."""
+    tokens = _TOKEN.findall(_URL.sub(" ", text.lower()))
+    if SHINGLE_SIZE == 1 or len(tokens) < SHINGLE_SIZE:
+        return tokens
+    return [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+
+def simhash(text):
+    """64-bit SimHash of the text's shingles, or None if it has no words."""
+    import numpy as np
+    feats = features(text or "")
+    if not feats:
+        return None
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little") for f in feats),
+        dtype=np.uint64, count=len(feats)
+    )
+    bits = (hashes[:, None] >> np.arange(SIMHASH_BITS, dtype=np.uint64)) & np.uint64(1)
+    majority = bits.sum(axis=0) * 2 > len(feats)
+    return sum(1 << int(i) for i in np.flatnonzero(majority))
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+def _buckets(sig):
+    """One LSH bucket per band: the band number and the band's bits packed into one integer."""
+    mask = (1 << BAND_BITS) - 1
+    return [(i << BAND_BITS) | ((sig >> (i * BAND_BITS)) & mask) for i in range(BANDS)]
+
+def _to_sql(sig):
+    # SQLite integers are signed 64-bit
+    return sig - (1 << 64) if sig >= 1 << 63 else sig
+
+def _from_sql(value):
+    return value + (1 << 64) if value < 0 else value
+
+class NearDupIndex:
+    """
+    Persistent SimHash index with LSH banding. Each signature is split into bands, and an
+    item is only compared with stored items that share a band exactly; the closest one
+    within `max_distance` bits puts it in that item's cluster, otherwise it starts its own.
+    A cluster is named after its first member, the representative. Re-adding a known key
+    returns its existing cluster, so re-runs over the same data are idempotent.
+
+    Clusters are shared by every pipeline using the index, so provenance spans sources.
+    What each consumer has passed on is tracked separately (see `forward`), so one
+    pipeline never drops an item because another pipeline has seen its story.
+    """
+
+    def __init__(self, path=None, max_distance=None):
+        self.path = path or NEAR_DUP_INDEX_PATH
+        # Pairs further apart than BANDS - 1 bits may never meet as candidates
+        self.max_distance = min(NEAR_DUP_MAX_DISTANCE if max_distance is None else max_distance, BANDS - 1)
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                key TEXT PRIMARY KEY,
+                simhash INTEGER NOT NULL,
+                cluster TEXT NOT NULL,
+                meta TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS signatures_cluster ON signatures (cluster)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                bucket INTEGER NOT NULL,
+                simhash INTEGER NOT NULL,
+                cluster TEXT NOT NULL
+            )
+        """)
+        # Covering index: candidate lookup never touches the signatures table
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (bucket, simhash, cluster)")
+        # The one member of each cluster a consumer (triage, indexer, research...) passed on
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS forwarded (
+                consumer TEXT NOT NULL,
+                cluster TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (consumer, cluster)
+            )
+        """)
+        self._conn.commit()
+
+    def assign(self, key, text, meta=None):
+        """
+        Files an item under its near-duplicate cluster and returns (cluster, is_representative).
+        Items without any words are never clustered.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT cluster FROM signatures WHERE key = ?", (key,)).fetchone()
+            if row:
+                return row[0], row[0] == key
+            sig = simhash(text)
+            if sig is None:
+                return key, True
+            buckets = _buckets(sig)
+            candidates = self._conn.execute(
+                f"SELECT DISTINCT simhash, cluster FROM buckets WHERE bucket IN ({','.join('?' * len(buckets))})",
+                buckets
+            ).fetchall()
+            cluster, best = key, self.max_distance + 1
+            for stored, stored_cluster in candidates:
+                distance = hamming(sig, _from_sql(stored))
+                if distance < best:
+                    cluster, best = stored_cluster, distance
+            self._conn.execute("INSERT INTO signatures VALUES (?, ?, ?, ?)",
+                               (key, _to_sql(sig), cluster, json.dumps(meta or {})))
+            self._conn.executemany("INSERT INTO buckets VALUES (?, ?, ?)",
+                                   [(b, _to_sql(sig), cluster) for b in buckets])
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+            return cluster, cluster == key
+
+    def forward(self, consumer, key, text, meta=None):
+        """
+        Files an item like `assign` and decides whether `consumer` should pass it on: yes if
+        it is the first member of its cluster the consumer has seen, or the one it passed on
+        before (so re-runs are idempotent), no if the consumer already passed on another one.
+        Returns (cluster, keep).
+        """
+        cluster, _ = self.assign(key, text, meta)
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO forwarded VALUES (?, ?, ?)", (consumer, cluster, key))
+            row = self._conn.execute("SELECT key FROM forwarded WHERE consumer = ? AND cluster = ?",
+                                     (consumer, cluster)).fetchone()
+        return cluster, row[0] == key
+
+    def duplicates_of(self, key):
+        """Provenance of an item: metadata of the other members of its cluster, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, meta FROM signatures "
+                "WHERE cluster = (SELECT cluster FROM signatures WHERE key = ?) AND key != ? ORDER BY rowid",
+                (key, key)
+            ).fetchall()
+        return [dict(json.loads(meta or "{}"), key=k) for k, meta in rows]
+
+    def flush(self):
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+@lru_cache(maxsize=None)
+def get_index():
+    return NearDupIndex()
+
+def dedupe(items, consumer, key, text, meta=None, index=None):
+    """
+    Keeps one item per near-duplicate cluster from a batch of items, for one `consumer`.
+    `key`, `text` and `meta` are functions of an item. Each kept item is returned as a copy
+    with a `duplicates` list holding the provenance of every other cluster member, from
+    this batch, from earlier runs or from other consumers. An item is only dropped when
+    this consumer has passed on another member of its cluster, in this batch or before.
+    """
+    index = index or get_index()
+    kept = []
+    for item in items:
+        _, keep = index.forward(consumer, key(item), text(item), meta(item) if meta else None)
+        if keep:
+            kept.append(item)
+    index.flush()
+    return [dict(item, duplicates=index.duplicates_of(key(item))) for item in kept]
@@ -0,0 +1,185 @@
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+INITIAL_CAPACITY = 1024
+
+
+class NumpyVectorStore:
+    """
+    In-process vector index: unit-normalized float32 embeddings in a memory-mapped matrix,
+    with ids, documents and metadata in a SQLite sidecar. An upsert only writes the rows it
+    touches, and documents stay on disk until a lookup returns them. Exposes the subset of the Chroma
+    collection API vector_indexer uses (upsert / get / query / count), with the same result
+    shapes, so it can stand in for a PersistentClient collection.
+
+    Search is exact cosine similarity: one matrix product over the rows that pass the
+    `where` filter, then a partial sort for the top k.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._lock = threading.Lock()
+        self._ids = []
+        self._metadatas = []
+        self._dim = None
+        self._capacity = 0
+        self._vectors = None
+        self._mask_cache = {}
+        os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(path, "meta.db"), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS items (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value INTEGER)")
+        self._conn.commit()
+        settings = dict(self._conn.execute("SELECT key, value FROM settings"))
+        self._dim = settings.get("dim")
+        self._capacity = settings.get("capacity", 0)
+        # Ids and the (small) metadata stay in memory for lookups and `where` filters
+        for id_, meta in self._conn.execute("SELECT id, metadata FROM items ORDER BY row"):
+            self._ids.append(id_)
+            self._metadatas.append(json.loads(meta))
+        if self._dim:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                      shape=(self._capacity, self._dim))
+        self._index = {id_: row for row, id_ in enumerate(self._ids)}
+
+    def count(self):
+        return len(self._ids)
+
+    def _grow(self, needed):
+        capacity = max(self._capacity, INITIAL_CAPACITY)
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self._dim * 4)
+        self._capacity = capacity
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(capacity, self._dim))
+
+    def _documents(self, rows):
+        rows = [int(r) for r in rows]
+        if not rows:
+            return []
+        found = dict(self._conn.execute(
+            f"SELECT row, document FROM items WHERE row IN ({','.join('?' * len(rows))})", rows
+        ))
+        return [found.get(r) for r in rows]
+
+    @staticmethod
+    def _normalize(matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        if not ids:
+            return
+        vectors = self._normalize(embeddings)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self._dim}")
+            rows, records = [], []
+            for id_, doc, meta in zip(ids, documents, metadatas):
+                row = self._index.get(id_)
+                if row is None:
+                    row = len(self._ids)
+                    self._index[id_] = row
+                    self._ids.append(id_)
+                    self._metadatas.append(meta or {})
+                else:
+                    self._metadatas[row] = meta or {}
+                rows.append(row)
+                records.append((row, id_, doc, json.dumps(meta or {})))
+            self._grow(len(self._ids))
+            self._vectors[rows] = vectors
+            self._vectors.flush()
+            self._mask_cache.clear()
+            # Vectors are on disk before the rows that point at them are committed
+            self._conn.executemany("""
+                INSERT INTO items VALUES (?, ?, ?, ?)
+                ON CONFLICT(row) DO UPDATE SET document = excluded.document, metadata = excluded.metadata
+            """, records)
+            self._conn.executemany("INSERT OR REPLACE INTO settings VALUES (?, ?)",
+                                   [("dim", self._dim), ("capacity", self._capacity)])
+            self._conn.commit()
+
+    def get(self, ids, include=("metadatas", "documents")):
+        with self._lock:
+            rows = [self._index[i] for i in ids if i in self._index]
+            result = {"ids": [self._ids[r] for r in rows]}
+            if "metadatas" in include:
+                result["metadatas"] = [self._metadatas[r] for r in rows]
+            if "documents" in include:
+                result["documents"] = self._documents(rows)
+            return result
+
+    def _matches(self, meta, where):
+        for key, cond in where.items():
+            if key == "$and":
+                if not all(self._matches(meta, c) for c in cond):
+                    return False
+            elif isinstance(cond, dict):
+                if meta.get(key) != cond.get("$eq"):
+                    return False
+            elif meta.get(key) != cond:
+                return False
+        return True
+
+    def _candidate_rows(self, where):
+        if not where:
+            return None
+        key = json.dumps(where, sort_keys=True)
+        rows = self._mask_cache.get(key)
+        if rows is None:
+            rows = np.array([r for r, meta in enumerate(self._metadatas) if self._matches(meta, where)],
+                            dtype=np.int64)
+            self._mask_cache[key] = rows
+        return rows
+
+    def query(self, query_embeddings, n_results=10, where=None):
+        queries = self._normalize(query_embeddings)
+        empty = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            if self._vectors is None:
+                for key in empty:
+                    empty[key] = [[] for _ in range(len(queries))]
+                return empty
+            rows = self._candidate_rows(where)
+            matrix = self._vectors[:len(self._ids)] if rows is None else self._vectors[rows]
+            if rows is None:
+                rows = np.arange(len(self._ids))
+            scores = matrix @ queries.T  # (candidates, queries)
+
+            k = min(n_results, len(rows))
+            result = {key: [] for key in empty}
+            for column in scores.T:
+                top = np.argpartition(-column, k - 1)[:k] if 0 < k < len(column) else np.arange(k)
+                top = top[np.argsort(-column[top])]
+                hits = rows[top]
+                result["ids"].append([self._ids[r] for r in hits])
+                result["documents"].append(self._documents(hits))
+                result["metadatas"].append([self._metadatas[r] for r in hits])
+                # Cosine distance, as Chroma reports it for a cosine-space collection
+                result["distances"].append((1.0 - column[top]).tolist())
+            return result
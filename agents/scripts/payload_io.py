@@ -0,0 +1,285 @@
+import gzip
+import io
+import json
+import os
+import time
+
+READ_CHUNK = 1 << 16
+WRITING_SUFFIX = ".writing"  # a PayloadWriter's in-progress file, renamed over the payload on success
+POLL_INTERVAL = 0.5
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+
+def _compression(path):
+    for suffix in COMPRESSED_SUFFIXES:
+        if path.endswith(suffix):
+            return suffix
+    return None
+
+
+def _open_text(path, mode, name=None):
+    """Open a payload file as text, (de)compressing by the suffix of `name` (default: the path): .gz via gzip, .zst via zstandard."""
+    compression = _compression(name or path)
+    if compression == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression == ".zst":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(f"{path}: reading or writing .zst payloads needs the zstandard package")
+        raw = open(path, mode + "b")
+        if mode == "r":
+            # Reddit archive dumps are compressed with a long window (up to 2 GiB)
+            stream = zstandard.ZstdDecompressor(max_window_size=2 ** 31).stream_reader(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8", buffering=1 if mode == "w" else -1)
+
+
+def _format_from_name(path):
+    name = path[:-len(_compression(path))] if _compression(path) else path
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if name.endswith(".json"):
+        return "json"
+    return None
+
+
+def detect_format(path):
+    """'jsonl' or 'json', from the extension (.jsonl / .ndjson / .json, optionally compressed), else by sniffing."""
+    fmt = _format_from_name(path)
+    if fmt:
+        return fmt
+    with _open_text(path, "r") as f:
+        while True:
+            ch = f.read(1)
+            if not ch or not ch.isspace():
+                return "json" if ch == "[" else "jsonl"
+
+
+def _writer_path(path):
+    return path + WRITING_SUFFIX
+
+
+def _wait_for_writer(path, poll_interval=POLL_INTERVAL):
+    while os.path.exists(_writer_path(path)):
+        time.sleep(poll_interval)
+
+
+def _same_file(f, path):
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except OSError:
+        return False
+
+
+def iter_json_array(path: str):
+    """Yield the elements of a top-level JSON array one at a time, reading the file in chunks.
+
+    Memory is bounded by the largest single element rather than the whole file. A file
+    holding a single JSON object yields that object.
+    """
+    decoder = json.JSONDecoder()
+    with _open_text(path, "r") as f:
+        buf = f.read(READ_CHUNK)
+        pos = 0
+        eof = not buf
+
+        def fill():
+            nonlocal buf, pos, eof
+            more = f.read(READ_CHUNK)
+            if not more:
+                eof = True
+            buf = buf[pos:] + more
+            pos = 0
+
+        # Skip leading whitespace and detect the container
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            fill()
+        if pos >= len(buf):
+            return
+        if buf[pos] != "[":
+            fill()
+            while not eof:
+                fill()
+            yield json.loads(buf)
+            return
+        pos += 1
+
+        while True:
+            # Skip separators between elements
+            while True:
+                while pos < len(buf) and (buf[pos].isspace() or buf[pos] == ","):
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                fill()
+            if pos >= len(buf) or buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A number at the very end of the buffer may be cut short; read on to be sure
+            if end == len(buf) and not eof:
+                fill()
+                continue
+            yield item
+            pos = end
+            if pos > READ_CHUNK:
+                buf, pos = buf[pos:], 0
+
+
+def _iter_lines(f, writer_done=None, poll_interval=POLL_INTERVAL):
+    """Yield one item per line of an open JSONL file, tailing it until `writer_done()` if given."""
+    follow = writer_done is not None
+    partial = ""
+    while True:
+        line = f.readline()
+        if line.endswith("\n") or (line and not follow):
+            line, partial = partial + line, ""
+            if line.strip():
+                yield json.loads(line)
+            continue
+        partial += line
+        if not follow:
+            if partial.strip():
+                yield json.loads(partial)
+            return
+        if writer_done():
+            follow = False  # writer is done: one last pass picks up whatever it flushed
+            continue
+        time.sleep(poll_interval)
+
+
+def iter_jsonl(path: str):
+    """Yield one item per line of a (optionally compressed) JSONL file."""
+    with _open_text(path, "r") as f:
+        yield from _iter_lines(f)
+
+
+def _tail_writer(path, poll_interval):
+    """
+    Tail a PayloadWriter's in-progress JSONL file until the writer publishes or abandons it.
+    Returns None if there is no writer to tail.
+    """
+    try:
+        f = _open_text(_writer_path(path), "r", name=path)
+    except FileNotFoundError:
+        return None
+
+    def items():
+        with f:
+            # The open file survives the writer's rename, so reading simply carries on
+            yield from _iter_lines(f, lambda: not _same_file(f, _writer_path(path)), poll_interval)
+            if not _same_file(f, path):
+                raise RuntimeError(f"{path}: the writer stopped before finishing; its items are incomplete")
+
+    return items()
+
+
+def iter_items(path: str, follow: bool = False, poll_interval: float = POLL_INTERVAL, since: float = None):
+    """Yield payload items from a .json array or a JSONL file, detecting the format.
+
+    With ``follow``, reads the next payload written to ``path`` rather than whatever is there:
+    the writer's in-progress file is tailed as items arrive (plain JSONL) or waited on (a JSON
+    array or a compressed stream is only readable once closed), and a finished payload is only
+    taken if it was written at or after ``since`` (default: now). A downstream stage can thus be
+    started before or alongside the upstream one without picking up the previous run's output.
+    """
+    if not follow:
+        if detect_format(path) == "jsonl":
+            yield from iter_jsonl(path)
+        else:
+            yield from iter_json_array(path)
+        return
+
+    since = time.time() if since is None else since
+    tailable = (_format_from_name(path) or "jsonl") == "jsonl" and not _compression(path)
+    while True:
+        if os.path.exists(_writer_path(path)):
+            tail = _tail_writer(path, poll_interval) if tailable else None
+            if tail is not None:
+                yield from tail
+                return
+            _wait_for_writer(path, poll_interval)
+            if not (os.path.exists(path) and os.stat(path).st_mtime >= since):
+                raise RuntimeError(f"{path}: the writer stopped before finishing; the previous payload was kept")
+        if os.path.exists(path) and os.stat(path).st_mtime >= since:
+            yield from iter_items(path)
+            return
+        time.sleep(poll_interval)
+
+
+class PayloadWriter:
+    """Writes items one at a time as a .json array or as (optionally compressed) JSONL.
+
+    The format follows the path like iter_items reads it. Items go to ``<path>.writing``,
+    which readers in follow mode tail, and replace ``path`` only once the writer is closed
+    cleanly; a writer that is aborted (or leaves its ``with`` block on an exception) removes
+    its file and leaves the previous payload in place.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.format = _format_from_name(path) or "jsonl"
+        self.count = 0
+        self._tmp_path = _writer_path(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._f = _open_text(self._tmp_path, "w", name=path)
+        if self.format == "json":
+            self._f.write("[")
+
+    def write(self, item):
+        if self.format == "jsonl":
+            self._f.write(json.dumps(item) + "\n")
+        else:
+            self._f.write(("," if self.count else "") + "\n" + json.dumps(item, indent=2))
+        self.count += 1
+
+    def write_many(self, items):
+        for item in items:
+            self.write(item)
+
+    def close(self):
+        """Finish the payload and publish it at `path`."""
+        if self._f is None:
+            return
+        if self.format == "json":
+            self._f.write("\n]\n" if self.count else "]\n")
+        self._f.close()
+        self._f = None
+        os.utime(self._tmp_path)  # mark the publish time for readers waiting on a fresh payload
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Discard what was written, keeping any previous payload at `path`."""
+        if self._f is None:
+            return
+        try:
+            self._f.close()
+        except OSError:
+            pass
+        self._f = None
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
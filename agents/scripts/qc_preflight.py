@@ -1,22 +1,146 @@
-import sys, json, re
+import os, re
+try:
+    from .payload_io import iter_items
+except ImportError:  # run as a script from agents/scripts
+    from payload_io import iter_items
 
 BANNED = [
   r"\bsubscribe\b", r"\bnewsletter\b", r"\bCTR\b", r"\bad spend\b",
   r"\bgrowth hacking\b", r"\bpromo code\b"
 ]
+QC_RULES_PATH = os.getenv("QC_RULES_PATH", "qc_rules.yaml")
+QC_FIELDS = ("title", "body")
 
-def main(path):
-    data = json.load(open(path))
-    if isinstance(data, dict):
-        items = [data]
-    else:
-        items = data
-    for item in items:
-        text = (item.get("title","") + " " + item.get("body","")).lower()
-        for pattern in BANNED:
-            if re.search(pattern, text):
-                raise SystemExit(f"QC BLOCK: matched '{pattern}'")
+_WORD = re.compile(r"\w")
+
+def load_qc_config(path=None):
+    """Banned lists from a YAML config (see qc_rules.yaml); without one, BANNED as global patterns."""
+    path = path or QC_RULES_PATH
+    if not os.path.exists(path):
+        return {"global": {"terms": [], "patterns": list(BANNED)}, "subreddits": {}}
+    import yaml
+    with open(path) as f:
+        config = yaml.safe_load(f) or {}
+    return {"global": config.get("global") or {}, "subreddits": config.get("subreddits") or {}}
+
+def _normalize(term):
+    return " ".join(term.lower().split())
+
+def trie_regex(terms):
+    """One regex matching any of the literal terms, factored into a character trie so shared prefixes are tried once."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in _normalize(term):
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        ends_here = "" in node
+        alts = [(r"\s+" if ch == " " else re.escape(ch)) + build(child)
+                for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        if len(alts) == 1 and not ends_here:
+            return alts[0]
+        return "(?:" + "|".join(alts) + ")" + ("?" if ends_here else "")
+
+    return build(trie)
+
+class QCMatcher:
+    """
+    A banned list compiled for scanning. Literal terms, the bulk of any list, share one
+    case-insensitive trie-factored regex bounded by non-word characters, so a field is searched
+    for all of them at once; each regex pattern is compiled on its own, so its groups and
+    backreferences behave exactly as written and its hits are reported even where they overlap
+    a term's.
+    """
+
+    def __init__(self, terms=(), patterns=()):
+        self.terms = {_normalize(t): t for t in terms if _normalize(t)}
+        self.patterns = list(patterns)
+        self._terms_regex = (re.compile(rf"(?<!\w){trie_regex(self.terms)}(?!\w)", re.IGNORECASE)
+                             if self.terms else None)
+        self._pattern_regexes = [re.compile(p, re.IGNORECASE) for p in self.patterns]
+
+    def _term_hits(self, text):
+        pos = 0
+        while True:
+            m = self._terms_regex.search(text, pos)
+            if m is None:
+                return
+            matched = m.group()
+            # The regex reports the longest term starting here; shorter ones end at a non-word character inside it
+            for i in range(1, len(matched)):
+                if not _WORD.match(matched[i]) and not matched[i - 1].isspace():
+                    rule = self.terms.get(_normalize(matched[:i]))
+                    if rule is not None:
+                        yield m.start(), m.start() + i, matched[:i], rule
+            yield m.start(), m.end(), matched, self.terms.get(_normalize(matched), matched)
+            # Resume just past the start, so terms that begin inside this one are found too
+            pos = m.start() + 1
+
+    def scan(self, text):
+        """Yields (start, end, matched_text, rule) for every violation in the text, ordered by position."""
+        if not text:
+            return
+        hits = list(self._term_hits(text)) if self._terms_regex else []
+        for pattern, regex in zip(self.patterns, self._pattern_regexes):
+            hits.extend((m.start(), m.end(), m.group(), pattern) for m in regex.finditer(text) if m.end() > m.start())
+        hits.sort(key=lambda hit: (hit[0], hit[1]))
+        yield from hits
+
+class QCEngine:
+    """Global plus per-subreddit banned lists; each subreddit's combined matcher is compiled on first use."""
+
+    def __init__(self, config=None):
+        config = config or load_qc_config()
+        self.global_rules = config.get("global") or {}
+        self.subreddit_rules = config.get("subreddits") or {}
+        self._matchers = {}
+
+    def matcher(self, subreddit=None):
+        key = subreddit if subreddit in self.subreddit_rules else None
+        if key not in self._matchers:
+            extra = (self.subreddit_rules.get(key) or {}) if key else {}
+            self._matchers[key] = QCMatcher(
+                terms=list(self.global_rules.get("terms") or []) + list(extra.get("terms") or []),
+                patterns=list(self.global_rules.get("patterns") or []) + list(extra.get("patterns") or [])
+            )
+        return self._matchers[key]
+
+    def check(self, item):
+        """Every violation in one bundle, with the field and character positions it was found at."""
+        matcher = self.matcher(item.get("subreddit"))
+        return [
+            {"id": item.get("id"), "subreddit": item.get("subreddit"), "field": field,
+             "start": start, "end": end, "match": text, "rule": rule}
+            for field in QC_FIELDS
+            for start, end, text, rule in matcher.scan(item.get(field) or "")
+        ]
+
+def main(path, follow=False, rules_path=None):
+    # A single bundle object, a JSON array or JSONL; items are checked as they stream in
+    engine = QCEngine(load_qc_config(rules_path))
+    items = violations = blocked = 0
+    for item in iter_items(path, follow=follow):
+        items += 1
+        found = engine.check(item)
+        if found:
+            blocked += 1
+            violations += len(found)
+        for v in found:
+            print(f"QC VIOLATION {v['id']} ({v['subreddit']}) {v['field']}[{v['start']}:{v['end']}] "
+                  f"'{v['match']}' matched '{v['rule']}'")
+    if violations:
+        raise SystemExit(f"QC BLOCK: {violations} violations in {blocked} of {items} items")
     print("QC PASS:", path)
 
 if __name__ == "__main__":
-    main(sys.argv[1] if len(sys.argv)>1 else "data/agent_instruction.json")
\ No newline at end of file
+    import argparse
+    ap = argparse.ArgumentParser("Check instruction bundles against the banned lists")
+    ap.add_argument("path", nargs="?", default="data/agent_instruction.json")
+    ap.add_argument("--rules", default=None, help=f"YAML banned-list config (default: {QC_RULES_PATH})")
+    ap.add_argument("--follow", action="store_true", help="check the next bundles triage_agent.py writes, as soon as they are finished")
+    args = ap.parse_args()
+    main(args.path, follow=args.follow, rules_path=args.rules)
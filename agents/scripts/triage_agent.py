@@ -1,16 +1,34 @@
-import json
+import heapq
+import os
+import re
+import time
+from collections import Counter
 from datetime import datetime, timezone
-from typing import List, Dict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+try:
+    from .payload_io import PayloadWriter, iter_items
+except ImportError:  # run as a script from agents/scripts
+    from payload_io import PayloadWriter, iter_items
 
 # Adjust these filters as needed
 MIN_COMMENTS = 3
 MIN_SCORE = 1
 KEY_SUBREDDITS = ["MachineLearning", "artificial", "lectures", "ArtificialIntelligence"]
+TRIAGE_RULES_PATH = os.getenv("TRIAGE_RULES_PATH", "triage_rules.yaml")
+
+# Engagement velocity: (score + COMMENT_WEIGHT * num_comments) / (age_hours + AGE_OFFSET_HOURS) ** GRAVITY
+COMMENT_WEIGHT = 2.0
+AGE_OFFSET_HOURS = 2.0
+GRAVITY = 1.5
+RANK_CHUNK_SIZE = 10000
 
 def load_reddit_payload(path: str) -> List[Dict]:
     """Load scraped subreddits/posts JSON file for triaging."""
-    with open(path, "r") as f:
-        return json.load(f)
+    return list(iter_reddit_payload(path))
+
+def iter_reddit_payload(path: str, follow: bool = False) -> Iterator[Dict]:
+    """Stream items from a .json or .jsonl[.gz|.zst] payload; `follow` tails a payload still being written."""
+    return iter_items(path, follow=follow)
 
 def is_relevant(item: Dict) -> bool:
     """Basic filtering based on subreddit, score, comments, and type."""
@@ -23,6 +41,105 @@ def is_relevant(item: Dict) -> bool:
     # Accept all comments for context relevance
     return True
 
+def default_rules() -> List[Dict]:
+    """The is_relevant filter expressed as rule specs, used when no rules file exists."""
+    return [
+        {"name": "key_subreddits", "field": "subreddit", "in": list(KEY_SUBREDDITS)},
+        {"name": "min_score", "when": {"type": "post"}, "field": "score", "min": MIN_SCORE},
+        {"name": "min_comments", "when": {"type": "post"}, "field": "num_comments", "min": MIN_COMMENTS},
+    ]
+
+def load_rules(path: Optional[str] = None) -> List[Dict]:
+    """Rule specs from a YAML rules file (see triage_rules.yaml), or default_rules() if there is none."""
+    path = path or TRIAGE_RULES_PATH
+    if not os.path.exists(path):
+        return default_rules()
+    import yaml
+    with open(path) as f:
+        return (yaml.safe_load(f) or {}).get("rules") or []
+
+def _field_getter(spec: Dict) -> Callable[[Dict], object]:
+    if "fields" in spec:
+        fields = list(spec["fields"])
+        return lambda item: " ".join(str(item.get(f) or "") for f in fields)
+    field = spec["field"]
+    return lambda item: item.get(field)
+
+def compile_rule(spec: Dict) -> Callable[[Dict], bool]:
+    """Compile one rule spec into a predicate that returns False when the rule rejects the item."""
+    get = _field_getter(spec)
+    checks = []
+    if "in" in spec:
+        allowed = frozenset(spec["in"])
+        checks.append(lambda item: get(item) in allowed)
+    if "not_in" in spec:
+        blocked = frozenset(spec["not_in"])
+        checks.append(lambda item: get(item) not in blocked)
+    if "min" in spec:
+        lo = spec["min"]
+        checks.append(lambda item: (get(item) or 0) >= lo)
+    if "max" in spec:
+        hi = spec["max"]
+        checks.append(lambda item: (get(item) or 0) <= hi)
+    flags = re.IGNORECASE if spec.get("ignore_case", True) else 0
+    if "regex" in spec:
+        search = re.compile(spec["regex"], flags).search
+        checks.append(lambda item: search(str(get(item) or "")) is not None)
+    if "not_regex" in spec:
+        search_blocked = re.compile(spec["not_regex"], flags).search
+        checks.append(lambda item: search_blocked(str(get(item) or "")) is None)
+    if not checks:
+        raise ValueError(f"Triage rule {spec.get('name')!r} has no check (in/not_in/min/max/regex/not_regex)")
+
+    guards = []
+    for field, expected in (spec.get("when") or {}).items():
+        if isinstance(expected, (list, tuple, set)):
+            guards.append((field, frozenset(expected)))
+        else:
+            guards.append((field, frozenset([expected])))
+
+    check = checks[0] if len(checks) == 1 else (lambda item: all(c(item) for c in checks))
+    if not guards:
+        return check
+    return lambda item: any(item.get(f) not in values for f, values in guards) or check(item)
+
+class TriageEngine:
+    """
+    Runs compiled rules over a stream of items and turns the survivors into instruction
+    bundles. Holds nothing per item, so memory stays constant however long the stream is;
+    `hits` counts, per rule, the items that rule rejected.
+    """
+
+    def __init__(self, rules: Optional[List[Dict]] = None):
+        specs = default_rules() if rules is None else rules
+        self.rules = [(spec.get("name") or f"rule_{i}", compile_rule(spec)) for i, spec in enumerate(specs)]
+        self.hits = Counter()
+        self.seen = 0
+        self.kept = 0
+
+    def accept(self, item: Dict) -> bool:
+        self.seen += 1
+        for name, passes in self.rules:
+            if not passes(item):
+                self.hits[name] += 1
+                return False
+        self.kept += 1
+        return True
+
+    def run(self, items: Iterable[Dict]) -> Iterator[Dict]:
+        for item in items:
+            if "type" not in item:
+                # Archive dumps carry no type: submissions have a title, comments do not
+                item["type"] = "post" if "title" in item else "comment"
+            if self.accept(item):
+                yield format_instruction_bundle(item)
+
+    def report(self) -> str:
+        lines = [f"Triage: {self.seen} items, {self.kept} kept, {self.seen - self.kept} rejected"]
+        for name, _ in self.rules:
+            lines.append(f"  {name}: {self.hits[name]} rejected")
+        return "\n".join(lines)
+
 def format_instruction_bundle(item: Dict) -> Dict:
     """Convert a Reddit post/comment into agent instruction components."""
     title = item.get("title") or f"Comment in {item.get('subreddit')}"
@@ -36,28 +153,161 @@ def format_instruction_bundle(item: Dict) -> Dict:
         "type": item.get("type"),
         "title": title[:300],
         "body": body,
-        "link": link
+        "link": link,
+        "score": int(item.get("score") or 0),
+        "num_comments": int(item.get("num_comments") or 0),
+        "created_utc": int(item.get("created_utc") or 0)
     }
 
-def triage_and_write(input_path: str, output_path: str):
-    items = load_reddit_payload(input_path)
-    bundles = [format_instruction_bundle(i) for i in items if is_relevant(i)]
+def engagement_velocity(score, num_comments, created_utc, now):
+    """Vectorized engagement velocity over NumPy arrays: engagement per hour of age, damped by GRAVITY."""
+    import numpy as np
+    age_hours = np.maximum(now - created_utc, 0.0) / 3600.0
+    return (score + COMMENT_WEIGHT * num_comments) / np.power(age_hours + AGE_OFFSET_HOURS, GRAVITY)
+
+class TopKRanker:
+    """
+    Keeps the `k` bundles with the highest engagement velocity per subreddit. Bundles are
+    scored a chunk at a time with NumPy; within a chunk, each subreddit's candidates are
+    visited best-first and only pushed into its bounded min-heap while they beat the
+    current k-th best. Memory is one chunk plus k bundles per subreddit; nothing is sorted
+    except the final k-per-subreddit survivors.
+    """
+
+    def __init__(self, k: int, now: Optional[float] = None, chunk_size: int = RANK_CHUNK_SIZE):
+        self.k = k
+        self.now = time.time() if now is None else now
+        self.chunk_size = chunk_size
+        self._chunk = []
+        self._heaps = {}
+        self._seq = 0  # tie-breaker so equal velocities never compare bundles
+
+    def add(self, bundle: Dict):
+        self._chunk.append(bundle)
+        if len(self._chunk) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        import numpy as np
+        chunk, self._chunk = self._chunk, []
+        if not chunk or self.k <= 0:
+            return
+        n = len(chunk)
+        velocity = engagement_velocity(
+            np.fromiter((b.get("score") or 0 for b in chunk), dtype=np.float64, count=n),
+            np.fromiter((b.get("num_comments") or 0 for b in chunk), dtype=np.float64, count=n),
+            np.fromiter((b.get("created_utc") or 0 for b in chunk), dtype=np.float64, count=n),
+            self.now
+        )
+        codes_by_sub = {}
+        codes = np.fromiter((codes_by_sub.setdefault(b.get("subreddit"), len(codes_by_sub)) for b in chunk),
+                            dtype=np.int64, count=n)
+        # Group by subreddit, best first within each group
+        order = np.lexsort((-velocity, codes))
+        bounds = np.searchsorted(codes[order], np.arange(len(codes_by_sub) + 1))
+        for sub, code in codes_by_sub.items():
+            heap = self._heaps.setdefault(sub, [])
+            for row in order[bounds[code]:min(bounds[code + 1], bounds[code] + self.k)]:
+                v = float(velocity[row])
+                if len(heap) < self.k:
+                    heapq.heappush(heap, (v, self._seq, chunk[row]))
+                elif v > heap[0][0]:
+                    heapq.heapreplace(heap, (v, self._seq, chunk[row]))
+                else:
+                    break  # the rest of this group scores lower still
+                self._seq += 1
+
+    def ranked(self) -> List[Dict]:
+        """The kept bundles, highest velocity first, each annotated with its velocity."""
+        self._flush()
+        entries = [entry for heap in self._heaps.values() for entry in heap]
+        entries.sort(key=lambda e: (-e[0], e[1]))
+        return [dict(bundle, velocity=round(v, 4)) for v, _, bundle in entries]
 
-    if not bundles:
+def bundle_dedupe_key(bundle: Dict) -> str:
+    return f"reddit:{bundle['id']}"
+
+def drop_near_duplicates(bundles: Iterable[Dict], index, stats: Counter) -> Iterator[Dict]:
+    """Forwards one bundle per near-duplicate cluster, as far as triage is concerned (see near_dup.py)."""
+    for bundle in bundles:
+        _, keep = index.forward(
+            "triage",
+            bundle_dedupe_key(bundle),
+            f"{bundle.get('title') or ''}\n{bundle.get('body') or ''}",
+            {"source": f"r/{bundle.get('subreddit')}", "type": bundle.get("type"), "link": bundle.get("link")}
+        )
+        if keep:
+            yield bundle
+        else:
+            stats["near_duplicates"] += 1
+
+def triage_and_write(input_path: str, output_path: str, follow: bool = False, rules_path: Optional[str] = None,
+                     top_k: Optional[int] = None, dedupe: bool = False):
+    """
+    Filters the payload through the triage rules. With `top_k`, only the `top_k` bundles per
+    subreddit with the highest engagement velocity are kept, written best first. With
+    `dedupe`, near-duplicates are dropped and each representative lists them under
+    `duplicates` (as known when it is written).
+    """
+    engine = TriageEngine(load_rules(rules_path))
+    ranker = TopKRanker(top_k) if top_k else None
+    index, dedupe_stats = None, Counter()
+    if dedupe:
+        try:
+            from .near_dup import get_index
+        except ImportError:  # run as a script from agents/scripts
+            from near_dup import get_index
+        index = get_index()
+    writer = None
+    start = time.perf_counter()
+    try:
+        bundles = engine.run(iter_reddit_payload(input_path, follow=follow))
+        if index:
+            bundles = drop_near_duplicates(bundles, index, dedupe_stats)
+        if ranker:
+            for bundle in bundles:
+                ranker.add(bundle)
+            bundles = ranker.ranked()
+        for bundle in bundles:
+            # Opened on the first hit so that a run with no matches leaves no output behind
+            writer = writer or PayloadWriter(output_path)
+            if index:
+                bundle = dict(bundle, duplicates=index.duplicates_of(bundle_dedupe_key(bundle)))
+            writer.write(bundle)
+    except BaseException:
+        # Keep the previous instruction file rather than publishing a partial one
+        if writer:
+            writer.abort()
+        raise
+    else:
+        if writer:
+            writer.close()
+    finally:
+        if index:
+            index.flush()
+    print(engine.report())
+    if index:
+        print(f"  near-duplicates dropped: {dedupe_stats['near_duplicates']}")
+    print(f"Triage took {time.perf_counter() - start:.2f}s")
+
+    if not writer:
         print("No relevant items found.")
         return
 
-    with open(output_path, "w") as f:
-        json.dump(bundles, f, indent=2)
-
-    print(f"Wrote {len(bundles)} instruction bundles to {output_path}")
+    print(f"Wrote {writer.count} instruction bundles to {output_path}" + (f" (top {top_k} per subreddit)" if top_k else ""))
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser("Triage Reddit data into agent instruction bundles")
     parser.add_argument("--input", default="data/reddit_payload.json")
     parser.add_argument("--output", default="data/agent_instruction.json")
+    parser.add_argument("--rules", default=None, help=f"YAML rules file (default: {TRIAGE_RULES_PATH})")
+    parser.add_argument("--top_k", type=int, default=None,
+                        help="keep only the K highest engagement-velocity bundles per subreddit, sorted best first")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="drop near-duplicates (crossposts, reposts) and record their provenance on the representative")
+    parser.add_argument("--follow", action="store_true", help="consume the next payload fetch_reddit.py writes, while it is still being written")
     args = parser.parse_args()
 
-    triage_and_write(args.input, args.output)
-
+    triage_and_write(args.input, args.output, follow=args.follow, rules_path=args.rules, top_k=args.top_k,
+                     dedupe=args.dedupe)
@@ -1,85 +1,342 @@
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
+import hashlib
 import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from functools import lru_cache
+try:
+    from .payload_io import iter_items as iter_payload
+except ImportError:  # run as a script from agents/scripts
+    from payload_io import iter_items as iter_payload
 from dotenv import load_dotenv; load_dotenv()
 os.environ.setdefault("OPENAI_API_KEY", os.getenv("OPEN_AI_KEY", ""))
 
 USE_LOCAL = os.getenv("EMBEDDING_BACKEND","openai").lower() == "local"
-if USE_LOCAL:
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 256))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", 4))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./chroma_data/embedding_cache.db")
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 1024))
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()  # chroma | numpy
+NUMPY_STORE_PATH = os.getenv("NUMPY_STORE_PATH", "./vector_data")
+
+# Clients are created on first use: chromadb, openai and sentence-transformers are slow to
+# import and initialize, and most callers of this module never touch all of them.
+
+@lru_cache(maxsize=None)
+def get_local_ef():
     from chromadb.utils import embedding_functions
-    local_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
         model_name=os.getenv("LOCAL_EMBED_MODEL","all-MiniLM-L6-v2")
     )
 
-# Use OpenAI or other embedding model
-from openai import OpenAI
-
 # Optional: configure if using LangChain embedding wrapper
 # from langchain.embeddings import OpenAIEmbeddings
 
-# 1. Initialize ChromaDB
-client = chromadb.PersistentClient(path="./chroma_data")
-
-collection = client.get_or_create_collection(
-    name="reddit_posts",
-    metadata={"description": "Agent‑1 Reddit posts & comments context"}
-)
-
-# 2. Initialize embedding function
-openai_client = OpenAI(api_key=os.getenv("OPEN_AI_KEY"))
+# 1. Vector collection: ChromaDB, or the in-process NumPy store with the same API subset
+@lru_cache(maxsize=None)
+def get_collection():
+    if VECTOR_BACKEND == "numpy":
+        try:
+            from .numpy_store import NumpyVectorStore
+        except ImportError:  # run as a script from agents/scripts
+            from numpy_store import NumpyVectorStore
+        return NumpyVectorStore(NUMPY_STORE_PATH)
+    import chromadb
+    client = chromadb.PersistentClient(path="./chroma_data")
+    return client.get_or_create_collection(
+        name="reddit_posts",
+        metadata={"description": "Agent‑1 Reddit posts & comments context"}
+    )
 
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+# 2. Embedding client (OpenAI or other embedding model)
+@lru_cache(maxsize=None)
+def get_openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPEN_AI_KEY"))
 
-def embed_texts(texts):
+def _embed_uncached(texts):
     if USE_LOCAL:
-        return local_ef(texts)
-    resp = openai_client.embeddings.create(
+        return [[float(x) for x in vec] for vec in get_local_ef()(texts)]
+    resp = get_openai_client().embeddings.create(
         model=EMBEDDING_MODEL,
         input=texts
     )
     return [d.embedding for d in resp.data]
 
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Persistent embeddings keyed by (backend, model, sha256(text)), stored as float32 blobs"""
+
+    def __init__(self, path=None):
+        self.path = path or EMBEDDING_CACHE_PATH
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                backend TEXT NOT NULL,
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (backend, model, text_hash)
+            )
+        """)
+        self._conn.commit()
+
+    def get_many(self, backend, model, hashes):
+        hashes = list(hashes)
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE backend = ? AND model = ? "
+                    f"AND text_hash IN ({','.join('?' * len(chunk))})",
+                    [backend, model, *chunk]
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = array("f", blob).tolist()
+        self.hits += len(found)
+        self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, backend, model, vectors_by_hash):
+        rows = [(backend, model, h, array("f", vec).tobytes()) for h, vec in vectors_by_hash.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+@lru_cache(maxsize=None)
+def get_embedding_cache():
+    return EmbeddingCache()
+
+def embed_texts(texts):
+    """
+    Embeds texts, serving repeats from the persistent cache. Only unseen texts are sent,
+    deduplicated, in batches of EMBED_BATCH_SIZE; OpenAI batches are dispatched concurrently.
+    """
+    backend = "local" if USE_LOCAL else "openai"
+    model = os.getenv("LOCAL_EMBED_MODEL","all-MiniLM-L6-v2") if USE_LOCAL else EMBEDDING_MODEL
+    cache = get_embedding_cache()
+
+    hashes = [text_hash(t) for t in texts]
+    found = cache.get_many(backend, model, set(hashes))
+    missing = {}
+    for h, t in zip(hashes, texts):
+        if h not in found:
+            missing[h] = t
+
+    if missing:
+        pending = list(missing)
+        batches = [pending[i:i + EMBED_BATCH_SIZE] for i in range(0, len(pending), EMBED_BATCH_SIZE)]
+
+        # A local model is CPU-bound in this process, so it gets a single worker
+        workers = 1 if USE_LOCAL else EMBED_CONCURRENCY
+        error = None
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_embed_uncached, [missing[h] for h in batch]): batch for batch in batches}
+            # Cache every batch that succeeds, even after another has failed, then re-raise
+            for future in as_completed(futures):
+                try:
+                    vectors = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                fresh = dict(zip(futures[future], vectors))
+                cache.put_many(backend, model, fresh)
+                found.update(fresh)
+        if error is not None:
+            raise error
+
+    return [found[h] for h in hashes]
+
 # 3. Index new items (e.g. fetched Reddit threads or comments)
 def index_items(items: list):
     """
     items: list of dict with keys 'id', 'text', 'subreddit', 'type', 'timestamp'
+    Upserts, so re-indexing an id replaces it instead of failing.
     """
     texts = [i["text"] for i in items]
     ids = [i["id"] for i in items]
     metadatas = [{"subreddit": i["subreddit"], "type": i["type"], "ts": i["timestamp"]} for i in items]
     embeddings = embed_texts(texts)
-    collection.add(
+    get_collection().upsert(
         ids=ids,
         documents=texts,
         embeddings=embeddings,
         metadatas=metadatas
     )
 
+class QueryEmbeddingLRU:
+    """In-memory LRU of query embeddings in front of the persistent cache (no SQLite round-trip on a hit)"""
+
+    def __init__(self, maxsize=None):
+        self.maxsize = QUERY_CACHE_SIZE if maxsize is None else maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text):
+        with self._lock:
+            vec = self._entries.get(text)
+            if vec is not None:
+                self._entries.move_to_end(text)
+            return vec
+
+    def put(self, text, vec):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[text] = vec
+            self._entries.move_to_end(text)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+_query_lru = QueryEmbeddingLRU()
+
+def embed_queries(queries):
+    """Embeds query strings, serving repeats from memory; misses go out as one embed_texts batch."""
+    vectors = [_query_lru.get(q) for q in queries]
+    missing = list(dict.fromkeys(q for q, v in zip(queries, vectors) if v is None))
+    if missing:
+        fresh = dict(zip(missing, embed_texts(missing)))
+        for q, vec in fresh.items():
+            _query_lru.put(q, vec)
+        vectors = [fresh[q] if v is None else v for q, v in zip(queries, vectors)]
+    return vectors
+
+def _format_context(documents, metadatas):
+    context = []
+    for doc, meta in zip(documents, metadatas):
+        snippet = f"[{meta.get('type')} in r/{meta.get('subreddit')}]: {doc[:300]}..."
+        context.append(snippet)
+    return context
+
 # 4. Retrieve context for new post prompt
 def retrieve_context(subreddit: str, query_text: str, top_k=3):
-    q_emb = embed_texts([query_text])[0]
-    results = collection.query(
-        query_embeddings=[q_emb],
+    return retrieve_context_many(subreddit, [query_text], top_k=top_k)[0]
+
+def retrieve_context_many(subreddit: str, queries: list, top_k=3):
+    """
+    Context snippets for each query, in order. All queries are embedded in one batch and
+    answered by a single multi-embedding Chroma query instead of one round-trip per query.
+    """
+    if not queries:
+        return []
+    results = get_collection().query(
+        query_embeddings=embed_queries(queries),
         n_results=top_k,
         where={"subreddit": subreddit}
     )
-    # results["documents"] is list[list[str]]
-    context = []
-    for doc, meta in zip(results["documents"][0], results["metadatas"][0]):
-        snippet = f"[{meta.get('type')} in r/{meta.get('subreddit')}]: {doc[:300]}..."
-        context.append(snippet)
-    return context
+    # results["documents"] is list[list[str]], one inner list per query embedding
+    return [_format_context(docs, metas) for docs, metas in zip(results["documents"], results["metadatas"])]
+
+def payload_to_doc(item):
+    """Map a fetch_reddit.py payload item to an index document, or None if it has no text."""
+    text = "\n".join(part for part in (item.get("title"), item.get("selftext") or item.get("body")) if part)
+    if not text.strip():
+        return None
+    prefix = "t3" if item.get("type") == "post" else "t1"
+    created = item.get("created_utc") or 0
+    return {
+        "id": f"{prefix}_{item['id']}",
+        "text": text,
+        "subreddit": item.get("subreddit") or "",
+        "type": item.get("type") or "",
+        "timestamp": datetime.fromtimestamp(created, timezone.utc).isoformat(),
+        "hash": text_hash(text)
+    }
+
+def _upsert_changed(docs, stats):
+    collection = get_collection()
+    existing = collection.get(ids=[d["id"] for d in docs], include=["metadatas"])
+    known = {i: (m or {}).get("hash") for i, m in zip(existing["ids"], existing["metadatas"])}
+    changed = [d for d in docs if known.get(d["id"]) != d["hash"]]
+    stats["unchanged"] += len(docs) - len(changed)
+    if not changed:
+        return
+    collection.upsert(
+        ids=[d["id"] for d in changed],
+        documents=[d["text"] for d in changed],
+        embeddings=embed_texts([d["text"] for d in changed]),
+        metadatas=[{"subreddit": d["subreddit"], "type": d["type"], "ts": d["timestamp"], "hash": d["hash"]}
+                   for d in changed]
+    )
+    stats["upserted"] += len(changed)
+
+def index_payload(path, chunk_size=500, dedupe=False):
+    """
+    Streams a fetch_reddit.py payload into the index in chunks of `chunk_size`, so memory
+    stays bounded regardless of file size. Documents whose content hash matches what is
+    already stored are skipped; new and edited ones are embedded and upserted. With
+    `dedupe`, near-duplicates of an already indexed document are not embedded at all;
+    their provenance stays in the near-duplicate index.
+    """
+    stats = {"seen": 0, "empty": 0, "near_duplicates": 0, "unchanged": 0, "upserted": 0}
+    near_dups = None
+    if dedupe:
+        try:
+            from .near_dup import get_index
+        except ImportError:  # run as a script from agents/scripts
+            from near_dup import get_index
+        near_dups = get_index()
+    start = time.perf_counter()
+    chunk = {}
+    for item in iter_payload(path):
+        stats["seen"] += 1
+        doc = payload_to_doc(item)
+        if doc is None:
+            stats["empty"] += 1
+            continue
+        if near_dups:
+            _, keep = near_dups.forward("vector_index", f"reddit:{doc['subreddit']}_{item['id']}", doc["text"],
+                                        {"source": f"r/{doc['subreddit']}", "type": doc["type"], "id": doc["id"]})
+            if not keep:
+                stats["near_duplicates"] += 1
+                continue
+        chunk[doc["id"]] = doc  # a later duplicate of the same id wins
+        if len(chunk) >= chunk_size:
+            _upsert_changed(list(chunk.values()), stats)
+            chunk = {}
+    if chunk:
+        _upsert_changed(list(chunk.values()), stats)
+    if near_dups:
+        near_dups.flush()
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    stats["docs_per_sec"] = round(stats["seen"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    return stats
 
 if __name__ == "__main__":
-    # Example usage:
-    example = [{
-        "id": "rMLQ1234",
-        "text": "Turning Ilya Sutskever's 30 papers into stories...",
-        "subreddit": "MachineLearning",
-        "type": "post",
-        "timestamp": "2025-07-28T12:00:00Z"
-    }]
-    index_items(example)
-    print("Indexed example. Sample context:", retrieve_context("MachineLearning", example[0]["text"]))
+    import argparse
+    ap = argparse.ArgumentParser("Index Reddit items into the vector store")
+    ap.add_argument("--payload", help="fetch_reddit.py output to bulk index (omit to run the example)")
+    ap.add_argument("--chunk_size", type=int, default=500)
+    ap.add_argument("--dedupe", action="store_true", help="skip near-duplicates of documents already indexed")
+    args = ap.parse_args()
 
+    if args.payload:
+        stats = index_payload(args.payload, chunk_size=args.chunk_size, dedupe=args.dedupe)
+        print(f"Indexed {args.payload}: {stats['seen']} items, {stats['upserted']} upserted, "
+              f"{stats['unchanged']} unchanged, {stats['empty']} empty, {stats['near_duplicates']} near-duplicates "
+              f"in {stats['seconds']}s ({stats['docs_per_sec']} docs/sec)")
+    else:
+        # Example usage:
+        example = [{
+            "id": "rMLQ1234",
+            "text": "Turning Ilya Sutskever's 30 papers into stories...",
+            "subreddit": "MachineLearning",
+            "type": "post",
+            "timestamp": "2025-07-28T12:00:00Z"
+        }]
+        index_items(example)
+        print("Indexed example. Sample context:", retrieve_context("MachineLearning", example[0]["text"]))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Compare HTML extraction backends on saved Substack pages.
+
+Usage: python benchmarks/bench_html_extract.py [--fixtures DIR] [--repeat N] [--budget CHARS]
+
+Drop real saved post pages (*.html) into the fixtures directory to benchmark against them.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_extract import EXTRACTORS, get_extractor
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'substack')
+
+
+def time_backend(extractor, pages, repeat, budget):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages.values():
+            extractor.extract(html, budget)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--budget", type=int, default=5000)
+    args = ap.parse_args()
+
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(args.fixtures, "*.html"))):
+        with open(path, "rb") as f:
+            pages[os.path.basename(path)] = f.read()
+    if not pages:
+        raise SystemExit(f"No *.html fixtures found in {args.fixtures}")
+
+    total_mb = sum(len(html) for html in pages.values()) * args.repeat / 1e6
+    extractors = {}
+    for name in EXTRACTORS:
+        extractor = get_extractor(name)
+        if extractor.name == name:  # skip backends that fell back to another one
+            extractors[name] = extractor
+
+    print(f"{len(pages)} fixtures, {args.repeat} repeats, budget {args.budget} chars\n")
+    print(f"{'backend':<8} {'seconds':>9} {'pages/s':>9} {'MB/s':>8}")
+    for name, extractor in extractors.items():
+        elapsed = time_backend(extractor, pages, args.repeat, args.budget)
+        pages_per_sec = len(pages) * args.repeat / elapsed
+        print(f"{name:<8} {elapsed:>9.3f} {pages_per_sec:>9.1f} {total_mb / elapsed:>8.2f}")
+
+    # Output equivalence against the original BeautifulSoup behaviour
+    print("\nEquivalence vs soup:")
+    reference = extractors['soup']
+    for name, extractor in extractors.items():
+        if name == 'soup':
+            continue
+        for fixture, html in pages.items():
+            expected = reference.extract(html, args.budget)
+            actual = extractor.extract(html, args.budget)
+            status = "identical" if actual == expected else f"DIFFERS ({len(actual)} vs {len(expected)} chars)"
+            print(f"  {name:<6} {fixture:<36} {status}")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Compare the single-pass QC engine with one re.search per banned pattern.
+
+Usage: python benchmarks/bench_qc.py [--items N] [--terms T] [--words W] [--hit-rate R]
+
+Bundles and banned terms are synthetic: bodies of W random words, T banned words and
+two-word phrases, and a fraction R of bundles seeded with one banned term. Both approaches
+must flag the same bundles; the baseline only finds the first hit per pattern, while the
+engine also reports every violation with its position.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'agents', 'scripts'))
+
+from qc_preflight import QCEngine
+
+
+def make_vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return list({"".join(rng.choices(letters, k=rng.randint(3, 9))) for _ in range(size)})
+
+
+def make_dataset(n_items, n_terms, n_words, hit_rate, seed=0):
+    rng = random.Random(seed)
+    vocab = make_vocabulary(20000, rng)
+    banned_words = make_vocabulary(n_terms, random.Random(seed + 1))
+    terms = [f"{w} {rng.choice(banned_words)}" if i % 3 == 0 else w for i, w in enumerate(banned_words)]
+    banned = set(banned_words)
+    clean_vocab = [w for w in vocab if w not in banned]
+    items = []
+    for i in range(n_items):
+        words = rng.choices(clean_vocab, k=n_words)
+        if rng.random() < hit_rate:
+            words[rng.randrange(n_words)] = rng.choice(terms)
+        items.append({"id": str(i), "subreddit": "MachineLearning", "title": " ".join(words[:12]),
+                      "body": " ".join(words[12:])})
+    return items, terms
+
+
+def baseline(items, patterns):
+    """The previous qc_preflight loop, changed to flag bundles instead of stopping at the first one"""
+    compiled = [re.compile(p) for p in patterns]
+    flagged = set()
+    for item in items:
+        text = (item.get("title", "") + " " + item.get("body", "")).lower()
+        for pattern in compiled:
+            if pattern.search(text):
+                flagged.add(item["id"])
+                break
+    return flagged
+
+
+def engine_scan(items, terms):
+    engine = QCEngine({"global": {"terms": terms, "patterns": []}, "subreddits": {}})
+    flagged, violations = set(), 0
+    for item in items:
+        found = engine.check(item)
+        if found:
+            flagged.add(item["id"])
+            violations += len(found)
+    return flagged, violations
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=2000)
+    ap.add_argument("--terms", type=int, default=500)
+    ap.add_argument("--words", type=int, default=200)
+    ap.add_argument("--hit-rate", type=float, default=0.05)
+    args = ap.parse_args()
+
+    items, terms = make_dataset(args.items, args.terms, args.words, args.hit_rate)
+    patterns = [r"\b" + r"\s+".join(re.escape(w) for w in t.split()) + r"\b" for t in terms]
+    print(f"{args.items} bundles x {args.words} words, {len(terms)} banned terms")
+
+    start = time.perf_counter()
+    expected = baseline(items, patterns)
+    base_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    flagged, violations = engine_scan(items, terms)
+    engine_s = time.perf_counter() - start
+
+    print(f"{'approach':<22} {'seconds':>9} {'items/s':>10} {'flagged':>8}")
+    print(f"{'per-pattern search':<22} {base_s:>9.2f} {args.items / base_s:>10.0f} {len(expected):>8}")
+    print(f"{'single-pass engine':<22} {engine_s:>9.2f} {args.items / engine_s:>10.0f} {len(flagged):>8}")
+    print(f"speedup {base_s / engine_s:.1f}x, {violations} violations reported, "
+          f"same bundles flagged: {flagged == expected}")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Measure cold-start cost of each entry point: import time and first-request latency.
+
+Usage: python benchmarks/bench_startup.py [--repeat N] [--only MODULE ...]
+
+Every sample runs in a fresh interpreter so nothing is already imported or initialized.
+First requests are offline-safe calls (no feeds, no API key) that exercise the code path
+a worker or CLI takes before its first network round-trip.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> Python expression run as the "first request" (None: import only)
+ENTRY_POINTS = {
+    'handler': "mod.handler({'input': {}})",
+    'lightweight_handler': "mod.handler({'input': {'test': 'ping'}})",
+    'research_handler': "mod.handler({'input': {'newsletters': [], 'include_outreach_strategy': False}})",
+    'runpod_research_function': "mod.handler({'input': {'newsletters': []}})",
+    'daily_intelligence': None,
+    'agent_loop': None,
+    'agents.brain': "mod.get_config()",
+    'agents.agent1_main': None,
+    'agents.scripts.vector_indexer': None,
+}
+
+PROBE = """
+import importlib, io, json, contextlib, time
+t0 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    mod = importlib.import_module({module!r})
+    t1 = time.perf_counter()
+    {call}
+    t2 = time.perf_counter()
+print(json.dumps({{"import_ms": (t1 - t0) * 1000, "first_request_ms": (t2 - t1) * 1000}}))
+"""
+
+
+def sample(module, call):
+    code = PROBE.format(module=module, call=call or "pass")
+    env = dict(os.environ, ANTHROPIC_API_KEY="", PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        last_line = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+        return None, last_line
+    return json.loads(proc.stdout.strip().splitlines()[-1]), None
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--only", nargs="*", default=None)
+    args = ap.parse_args()
+
+    print(f"{'entry point':<32} {'import ms':>10} {'first req ms':>13}")
+    for module, call in ENTRY_POINTS.items():
+        if args.only and module not in args.only:
+            continue
+        imports, requests_ms, error = [], [], None
+        for _ in range(args.repeat):
+            result, error = sample(module, call)
+            if error:
+                break
+            imports.append(result["import_ms"])
+            requests_ms.append(result["first_request_ms"])
+        if error:
+            print(f"{module:<32} {'unavailable: ' + error[:60]}")
+            continue
+        first = f"{statistics.median(requests_ms):>13.1f}" if call else f"{'-':>13}"
+        print(f"{module:<32} {statistics.median(imports):>10.1f} {first}")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Compare the NumPy vector store with Chroma on recall@k and query latency.
+
+Usage: python benchmarks/bench_vector_store.py [--n N] [--dim D] [--queries Q] [--k K] [--subreddits S]
+
+Vectors are synthetic clustered embeddings, unit-length like OpenAI embeddings, so no
+embedding API is needed. Ground truth is an exact cosine top-k within the query's subreddit;
+both stores are built in vector_indexer.index_payload's chunk size and queried with the same
+subreddit filter vector_indexer.retrieve_context uses. The Chroma collection is created the
+way vector_indexer.get_collection creates it, in Chroma's default L2 space.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.scripts.numpy_store import NumpyVectorStore
+
+
+def make_dataset(n, dim, n_subreddits, n_queries, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(64, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    subreddits = [f"sub{i % n_subreddits}" for i in range(n)]
+    queries = centers[rng.integers(0, len(centers), n_queries)] + 0.5 * rng.normal(size=(n_queries, dim)).astype(np.float32)
+    query_subs = [f"sub{i % n_subreddits}" for i in range(n_queries)]
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, subreddits, queries, query_subs
+
+
+def exact_top_k(vectors, subreddits, queries, query_subs, k):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    truth = []
+    for q, sub in zip(queries, query_subs):
+        rows = np.array([i for i, s in enumerate(subreddits) if s == sub])
+        scores = unit[rows] @ (q / np.linalg.norm(q))
+        truth.append({f"id{r}" for r in rows[np.argsort(-scores)[:k]]})
+    return truth
+
+
+def build(store, vectors, subreddits, batch=500):
+    start = time.perf_counter()
+    for i in range(0, len(vectors), batch):
+        store.upsert(
+            ids=[f"id{j}" for j in range(i, min(i + batch, len(vectors)))],
+            embeddings=vectors[i:i + batch].tolist(),
+            documents=[f"doc {j}" for j in range(i, min(i + batch, len(vectors)))],
+            metadatas=[{"subreddit": s} for s in subreddits[i:i + batch]]
+        )
+    return time.perf_counter() - start
+
+
+def run_queries(store, queries, query_subs, k):
+    latencies, found = [], []
+    for q, sub in zip(queries, query_subs):
+        start = time.perf_counter()
+        result = store.query(query_embeddings=[q.tolist()], n_results=k, where={"subreddit": sub})
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(set(result["ids"][0]))
+    return latencies, found
+
+
+def report(name, build_s, latencies, found, truth):
+    recall = statistics.mean(len(f & t) / len(t) for f, t in zip(found, truth))
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    print(f"{name:<8} {build_s:>9.2f} {statistics.median(latencies):>10.2f} {p95:>9.2f} {recall:>10.3f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--subreddits", type=int, default=8)
+    args = ap.parse_args()
+
+    vectors, subreddits, queries, query_subs = make_dataset(args.n, args.dim, args.subreddits, args.queries)
+    truth = exact_top_k(vectors, subreddits, queries, query_subs, args.k)
+    workdir = tempfile.mkdtemp(prefix="bench_vector_store_")
+    print(f"{args.n} vectors x {args.dim} dims, {args.queries} queries, k={args.k}")
+    print(f"{'backend':<8} {'build s':>9} {'p50 ms':>10} {'p95 ms':>9} {'recall@k':>10}")
+    try:
+        store = NumpyVectorStore(os.path.join(workdir, "numpy"))
+        build_s = build(store, vectors, subreddits)
+        report("numpy", build_s, *run_queries(store, queries, query_subs, args.k), truth)
+
+        try:
+            import chromadb
+        except ImportError:
+            print(f"{'chroma':<8} unavailable: chromadb is not installed")
+        else:
+            client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+            collection = client.get_or_create_collection(
+                name="bench",
+                metadata={"description": "Agent‑1 Reddit posts & comments context"}
+            )
+            build_s = build(collection, vectors, subreddits)
+            report("chroma", build_s, *run_queries(collection, queries, query_subs, args.k), truth)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -1,11 +1,19 @@
-import requests
+import http_client
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Configuration
 RUNPOD_API_KEY = "YOUR_RUNPOD_API_KEY"  # Replace with your actual key
 ENDPOINT_URL = "YOUR_ENDPOINT_URL"      # Replace with your actual endpoint URL
+STREAM_POLL_INTERVAL = 2  # seconds between /stream reads while no new chunks arrive
+
+# Sharded sweeps: newsletters per job, and the adaptive /status polling schedule (seconds)
+SHARD_SIZE = 3
+POLL_INITIAL_INTERVAL = 1
+POLL_MAX_INTERVAL = 15
+POLL_BACKOFF = 1.5
 
 # All the AI consciousness researchers we're tracking
 ALL_NEWSLETTERS = [
@@ -21,63 +29,249 @@ ALL_NEWSLETTERS = [
     "https://cameronrwolfe.substack.com"
 ]
 
-def run_research_intelligence(newsletters=None, posts_per_newsletter=3):
-    """Run the research intelligence collection"""
+def runpod_headers():
+    return {
+        "Authorization": f"{RUNPOD_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+def submit_job(job_input, headers):
+    """Start a job on the endpoint and return its id"""
+    response = http_client.post(ENDPOINT_URL, headers=headers, json={"input": job_input})
+    if response.status_code != 200:
+        raise RuntimeError(f"Error starting job: {response.status_code} - {response.text}")
+    return response.json()['id']
+
+def wait_for_job(job_id, headers, label=None):
+    """Poll /status with adaptive backoff until the job finishes, returning its output
+
+    Polling starts fast (short jobs and cache hits finish in seconds) and slows down while
+    the status stays the same, dropping back to the fast interval whenever it changes.
+    """
+    status_url = f"{ENDPOINT_URL.replace('/run', '')}/status/{job_id}"
+    label = label or job_id
+    interval = POLL_INITIAL_INTERVAL
+    last_status = None
+    
+    while True:
+        status_response = http_client.get(status_url, headers=headers)
+        if status_response.status_code != 200:
+            raise RuntimeError(f"Error checking status of {label}: {status_response.status_code}")
+        status_data = status_response.json()
+        status = status_data['status']
+        
+        if status == 'COMPLETED':
+            return status_data['output']
+        if status in ('FAILED', 'CANCELLED', 'TIMED_OUT'):
+            raise RuntimeError(f"Job {label} {status.lower()}: {status_data.get('error', 'Unknown error')}")
+        
+        if status != last_status:
+            print(f"⏳ {label}: {status}")
+            interval = POLL_INITIAL_INTERVAL
+            last_status = status
+        else:
+            interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+        time.sleep(interval)
+
+def iter_stream_events(base_url, job_id, headers):
+    """Yield each stage event from a streaming job's /stream endpoint as soon as it is published"""
+    stream_url = f"{base_url}/stream/{job_id}"
+    
+    while True:
+        stream_response = http_client.get(stream_url, headers=headers)
+        if stream_response.status_code != 200:
+            raise RuntimeError(f"Error reading stream: {stream_response.status_code}")
+        stream_data = stream_response.json()
+        
+        chunks = stream_data.get('stream', [])
+        for chunk in chunks:
+            yield chunk.get('output', chunk)
+        
+        status = stream_data.get('status')
+        if status == 'COMPLETED':
+            return
+        if status in ('FAILED', 'CANCELLED', 'TIMED_OUT'):
+            raise RuntimeError(f"Job {status.lower()}: {stream_data.get('error', 'Unknown error')}")
+        if not chunks:
+            time.sleep(STREAM_POLL_INTERVAL)
+
+def print_stream_event(event):
+    """Show progress for one stage event as it arrives"""
+    stage = event.get('type')
+    if stage == 'newsletter':
+        print(f"📰 {event['newsletter']}: {len(event['posts'])} posts")
+    elif stage == 'analysis':
+        print("🧠 Research intelligence ready")
+    elif stage == 'outreach':
+        print("📧 Outreach strategy ready")
+    elif stage == 'complete':
+        print("✅ Analysis complete!")
+
+def assemble_stream_report(events, newsletters):
+    """Merge stage events into the same report shape the non-streaming handler returns"""
+    collected = {}
+    report = {}
+    for event in events:
+        stage = event.get('type')
+        if stage == 'newsletter':
+            collected[event['newsletter']] = event['posts']
+        elif stage == 'analysis':
+            report['research_intelligence'] = event['research_intelligence']
+        elif stage == 'outreach':
+            report['outreach_strategy'] = event['outreach_strategy']
+        elif stage == 'complete':
+            report.update({k: v for k, v in event.items() if k != 'type'})
+        else:
+            # A non-streaming worker publishes its whole report as a single chunk
+            report.update(event)
+    if collected:
+        report['posts'] = [post for url in newsletters for post in collected.get(url, [])]
+    return report
+
+def job_report(output, newsletters):
+    """Report from a finished job's /status output, whichever mode the worker runs in
+
+    A plain worker returns its report as one dict; a streaming worker (RESEARCH_STREAMING=1,
+    return_aggregate_stream) returns the list of stage events it published.
+    """
+    events = output if isinstance(output, list) else [output or {}]
+    return assemble_stream_report([event.get('output', event) for event in events], newsletters)
+
+def run_research_intelligence(newsletters=None, posts_per_newsletter=3, incremental=False, force_full=False,
+                              stream=True):
+    """Run the research intelligence collection
+
+    With incremental=True the worker only scrapes and analyzes posts it has not seen
+    (or that changed) since the last run; force_full=True re-runs everything and refreshes
+    the ledger. With stream=True (worker started with RESEARCH_STREAMING=1) per-newsletter
+    results are shown as they arrive instead of after the whole job finishes; if the worker
+    publishes no stream events, the report is read from /status as in non-streaming mode.
+    """
     
     if newsletters is None:
         newsletters = ALL_NEWSLETTERS
     
-    payload = {
-        "input": {
-            "newsletters": newsletters,
-            "posts_per_newsletter": posts_per_newsletter,
-            "include_outreach_strategy": True
-        }
+    job_input = {
+        "newsletters": newsletters,
+        "posts_per_newsletter": posts_per_newsletter,
+        "include_outreach_strategy": True,
+        "incremental": incremental,
+        "force_full": force_full
     }
     
-    headers = {
-        "Authorization": f"{RUNPOD_API_KEY}",
-        "Content-Type": "application/json"
-    }
+    headers = runpod_headers()
     
     print(f"🚀 Starting research intelligence run...")
     print(f"📊 Scanning {len(newsletters)} newsletters")
     
     # Start the job
-    response = requests.post(ENDPOINT_URL, headers=headers, json=payload)
-    
-    if response.status_code != 200:
-        print(f"❌ Error starting job: {response.status_code}")
-        print(response.text)
+    try:
+        job_id = submit_job(job_input, headers)
+    except RuntimeError as e:
+        print(f"❌ {e}")
         return None
-    
-    job_data = response.json()
-    job_id = job_data['id']
+    base_url = ENDPOINT_URL.replace('/run', '')
     
     print(f"⏳ Job started: {job_id}")
+    
+    if stream:
+        events = []
+        try:
+            for event in iter_stream_events(base_url, job_id, headers):
+                print_stream_event(event)
+                events.append(event)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return None
+        if events:
+            return assemble_stream_report(events, newsletters)
+        # A worker without RESEARCH_STREAMING=1 may publish nothing on /stream; read /status instead
+        try:
+            output = wait_for_job(job_id, headers)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return None
+        print("✅ Analysis complete!")
+        return job_report(output, newsletters)
+    
     print("Processing... this may take 2-3 minutes")
     
-    # Poll for results
-    status_url = f"{ENDPOINT_URL.replace('/run', '')}/stream/{job_id}"
+    try:
+        output = wait_for_job(job_id, headers)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return None
+    print("✅ Analysis complete!")
+    return job_report(output, newsletters)
+
+def run_sharded_sweep(newsletters=None, posts_per_newsletter=4, shard_size=SHARD_SIZE,
+                      incremental=False, force_full=False, shared_ledger=False):
+    """Spread a sweep over several workers and merge the results into one report
+
+    Newsletters are split into shards of ``shard_size``; each shard is submitted as a
+    collect-only job and all of them run concurrently. The merged posts are then analyzed
+    by a single final job, so the report covers the whole sweep rather than one per shard.
+
+    With incremental=True the analysis job decides what is new: it drops posts its ledger
+    has already seen and records the rest once analyzed. Shards may run on other workers
+    with other ledgers, so by default they scrape everything (the HTTP cache keeps repeat
+    fetches cheap). Pass shared_ledger=True only when every worker's POST_LEDGER_PATH
+    points at the same network volume; shards then skip known posts before scraping.
+    """
     
-    while True:
-        status_response = requests.get(status_url, headers=headers)
-        if status_response.status_code == 200:
-            status_data = status_response.json()
-            
-            if status_data['status'] == 'COMPLETED':
-                print("✅ Analysis complete!")
-                return status_data['output']
-            elif status_data['status'] == 'FAILED':
-                print("❌ Job failed")
-                print(status_data.get('error', 'Unknown error'))
-                return None
-            else:
-                print(f"⏳ Status: {status_data['status']}")
-                time.sleep(10)
-        else:
-            print(f"❌ Error checking status: {status_response.status_code}")
-            return None
+    if newsletters is None:
+        newsletters = ALL_NEWSLETTERS
+    
+    headers = runpod_headers()
+    shards = [newsletters[i:i + shard_size] for i in range(0, len(newsletters), shard_size)]
+    
+    print(f"🚀 Starting sharded research run...")
+    print(f"📊 Scanning {len(newsletters)} newsletters across {len(shards)} jobs")
+    
+    def run_shard(index, shard):
+        label = f"shard {index + 1}/{len(shards)}"
+        job_id = submit_job({
+            "newsletters": shard,
+            "posts_per_newsletter": posts_per_newsletter,
+            "incremental": incremental and shared_ledger,
+            "force_full": force_full,
+            "collect_only": True
+        }, headers)
+        return job_report(wait_for_job(job_id, headers, label), shard)
+    
+    with ThreadPoolExecutor(max_workers=len(shards) or 1) as pool:
+        futures = [pool.submit(run_shard, i, shard) for i, shard in enumerate(shards)]
+    
+    posts, failed_shards = [], []
+    for shard, future in zip(shards, futures):
+        try:
+            posts.extend(future.result().get('posts', []))
+        except Exception as e:
+            print(f"❌ {e}")
+            failed_shards.append(shard)
+    
+    print(f"📥 Collected {len(posts)} posts from {len(shards) - len(failed_shards)}/{len(shards)} shards")
+    if len(failed_shards) == len(shards):
+        return None
+    
+    # One analysis over everything collected
+    try:
+        job_id = submit_job({
+            "posts": posts,
+            "newsletters": [url for shard in shards if shard not in failed_shards for url in shard],
+            "include_outreach_strategy": True,
+            "incremental": incremental,
+            "force_full": force_full
+        }, headers)
+        report = job_report(wait_for_job(job_id, headers, "analysis"), newsletters)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return None
+    
+    print("✅ Analysis complete!")
+    report['shards'] = len(shards)
+    report['failed_shards'] = failed_shards
+    return report
 
 def save_intelligence_report(data, filename=None):
     """Save the intelligence report to a file"""
@@ -104,7 +298,9 @@ def print_summary(data):
     print(f"📰 Newsletters scanned: {data.get('newsletters_scanned', 0)}")
     print(f"⏰ Generated at: {data.get('generated_at', 'Unknown')}")
     
-    if 'research_intelligence' in data and 'error' not in data['research_intelligence']:
+    if 'message' in data['research_intelligence']:
+        print(f"\n💤 {data['research_intelligence']['message']}")
+    elif 'error' not in data['research_intelligence']:
         intelligence = data['research_intelligence']['research_intelligence']
         print(f"\n📋 Intelligence Report Preview:")
         print(intelligence[:500] + "..." if len(intelligence) > 500 else intelligence)
@@ -127,10 +323,11 @@ def quick_scan(target_researchers=None):
     print("🔍 Quick scan mode - checking top researchers...")
     return run_research_intelligence(target_researchers, posts_per_newsletter=2)
 
-def full_sweep():
-    """Full intelligence sweep of all newsletters"""
+def full_sweep(force_full=False):
+    """Full intelligence sweep of all newsletters, analyzing only new or changed posts"""
     print("🌊 Full sweep mode - comprehensive intelligence gathering...")
-    return run_research_intelligence(ALL_NEWSLETTERS, posts_per_newsletter=4)
+    return run_sharded_sweep(ALL_NEWSLETTERS, posts_per_newsletter=4,
+                             incremental=True, force_full=force_full)
 
 if __name__ == "__main__":
     print("🎙️ The Papers That Dream - Research Intelligence System")
@@ -146,8 +343,9 @@ if __name__ == "__main__":
     print("1. Quick scan (3 key researchers)")
     print("2. Full sweep (all 10 newsletters)")
     print("3. Custom list")
+    print("4. Full re-sweep (ignore previously analyzed posts)")
     
-    choice = input("Enter choice (1-3): ").strip()
+    choice = input("Enter choice (1-4): ").strip()
     
     if choice == "1":
         data = quick_scan()
@@ -162,6 +360,8 @@ if __name__ == "__main__":
                 break
             custom_newsletters.append(url)
         data = run_research_intelligence(custom_newsletters)
+    elif choice == "4":
+        data = full_sweep(force_full=True)
     else:
         print("Invalid choice, running quick scan...")
         data = quick_scan()
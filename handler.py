@@ -1,7 +1,6 @@
-import runpod
-
 def handler(event):
     return {"message": "Working!", "input": event.get("input", {})}
 
 if __name__ == '__main__':
+    import runpod
     runpod.serverless.start({'handler': handler})
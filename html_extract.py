@@ -0,0 +1,111 @@
+import os
+from typing import Dict
+
+# Extraction rules (Substack specific): the first container found wins, in this order
+CONTENT_CONTAINERS = [
+    ('div', 'post-content'),
+    ('div', 'available-content'),
+    ('article', None),  # Fallback to the whole article
+]
+TEXT_TAGS = ['p', 'h1', 'h2', 'h3', 'blockquote']
+DEFAULT_CHAR_BUDGET = 5000
+
+HTML_EXTRACTOR = os.environ.get('HTML_EXTRACTOR', 'lxml')
+
+
+class Extractor:
+    """Turns a post page into plain text, keeping at most ``budget`` characters"""
+
+    name = 'base'
+
+    def extract(self, html: bytes, budget: int = DEFAULT_CHAR_BUDGET) -> str:
+        raise NotImplementedError
+
+
+class SoupExtractor(Extractor):
+    """BeautifulSoup with the pure-Python html.parser; walks the whole container"""
+
+    name = 'soup'
+
+    def extract(self, html: bytes, budget: int = DEFAULT_CHAR_BUDGET) -> str:
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, 'html.parser')
+        content_div = None
+        for tag, css_class in CONTENT_CONTAINERS:
+            content_div = soup.find(tag, class_=css_class) if css_class else soup.find(tag)
+            if content_div:
+                break
+        if not content_div:
+            return ""
+
+        # Extract text while preserving structure
+        paragraphs = content_div.find_all(TEXT_TAGS)
+        content = '\n\n'.join([p.get_text().strip() for p in paragraphs if p.get_text().strip()])
+        return content[:budget]
+
+
+class LxmlExtractor(Extractor):
+    """lxml's C parser; stops walking the container once the character budget is filled"""
+
+    name = 'lxml'
+
+    def __init__(self):
+        from lxml import html as lxml_html
+        self._lxml_html = lxml_html
+        self._container_xpaths = [
+            f"//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {css_class} ')]"
+            if css_class else f"//{tag}"
+            for tag, css_class in CONTENT_CONTAINERS
+        ]
+
+    def extract(self, html: bytes, budget: int = DEFAULT_CHAR_BUDGET) -> str:
+        if not html:
+            return ""
+        root = self._lxml_html.fromstring(html)
+        content_div = None
+        for xpath in self._container_xpaths:
+            found = root.xpath(xpath)
+            if found:
+                content_div = found[0]
+                break
+        if content_div is None:
+            return ""
+
+        parts = []
+        length = 0
+        for element in content_div.iterdescendants(*TEXT_TAGS):
+            text = element.text_content().strip()
+            if not text:
+                continue
+            length += len(text) + (2 if parts else 0)
+            parts.append(text)
+            if length >= budget:
+                break
+        return '\n\n'.join(parts)[:budget]
+
+
+EXTRACTORS = {
+    'soup': SoupExtractor,
+    'lxml': LxmlExtractor,
+}
+
+_instances: Dict[str, Extractor] = {}
+
+
+def get_extractor(name: str = None) -> Extractor:
+    """Return the named extractor, falling back to BeautifulSoup when lxml is not installed"""
+    name = name or HTML_EXTRACTOR
+    if name not in _instances:
+        if name not in EXTRACTORS:
+            raise ValueError(f"Unknown HTML extractor: '{name}'. Choose from {sorted(EXTRACTORS)}")
+        try:
+            _instances[name] = EXTRACTORS[name]()
+        except ImportError:
+            print(f"HTML extractor '{name}' unavailable, falling back to 'soup'")
+            _instances[name] = _instances.get('soup') or SoupExtractor()
+    return _instances[name]
+
+
+def extract_post_text(html: bytes, budget: int = DEFAULT_CHAR_BUDGET, backend: str = None) -> str:
+    return get_extractor(backend).extract(html, budget)
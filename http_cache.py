@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict
+
+import requests
+
+import http_client
+
+# Configuration
+HTTP_CACHE_DIR = os.environ.get('HTTP_CACHE_DIR', '.cache/http')
+HTTP_CACHE_TTL = int(os.environ.get('HTTP_CACHE_TTL', 900))  # seconds served without revalidating
+
+
+class CachedResponse:
+    """The subset of requests.Response the handlers use, plus where it came from"""
+
+    def __init__(self, url: str, status_code: int, content: bytes, headers: Dict, from_cache: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        content_type = self.headers.get('Content-Type', '') or self.headers.get('content-type', '')
+        encoding = 'utf-8'
+        if 'charset=' in content_type:
+            encoding = content_type.split('charset=')[-1].split(';')[0].strip() or encoding
+        try:
+            return self.content.decode(encoding, errors='replace')
+        except LookupError:
+            return self.content.decode('utf-8', errors='replace')
+
+
+def _cache_paths(url: str, cache_dir: str):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"{key}.json"), os.path.join(cache_dir, f"{key}.body")
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = f"{path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _load_entry(url: str, cache_dir: str):
+    meta_path, body_path = _cache_paths(url, cache_dir)
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            body = f.read()
+        return meta, body
+    except (OSError, ValueError):
+        return None, None
+
+
+def _store_entry(url: str, cache_dir: str, meta: Dict, body: bytes = None):
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path, body_path = _cache_paths(url, cache_dir)
+    if body is not None:
+        _atomic_write(body_path, body)
+    _atomic_write(meta_path, json.dumps(meta).encode('utf-8'))
+
+
+def fresh_cached(url: str, ttl: int = None, cache_dir: str = None):
+    """Return the cached response for a URL if it is younger than ``ttl`` seconds, else None
+
+    Never touches the network, so callers can serve fresh entries before queueing for a
+    politeness slot.
+    """
+    ttl = HTTP_CACHE_TTL if ttl is None else ttl
+    meta, body = _load_entry(url, cache_dir or HTTP_CACHE_DIR)
+    if meta and time.time() - meta['stored_at'] < ttl:
+        return CachedResponse(url, 200, body, meta['headers'], from_cache=True)
+    return None
+
+
+def cached_get(url: str, headers: Dict = None, timeout: int = 10, ttl: int = None,
+               cache_dir: str = None) -> CachedResponse:
+    """GET a URL through the on-disk cache
+
+    Entries younger than ``ttl`` seconds are served straight from disk. Older entries are
+    revalidated with If-None-Match / If-Modified-Since, and a 304 refreshes the entry without
+    re-downloading the body. If the network fails, a stale entry is served rather than nothing.
+    """
+    ttl = HTTP_CACHE_TTL if ttl is None else ttl
+    cache_dir = cache_dir or HTTP_CACHE_DIR
+    meta, body = _load_entry(url, cache_dir)
+
+    if meta and time.time() - meta['stored_at'] < ttl:
+        return CachedResponse(url, 200, body, meta['headers'], from_cache=True)
+
+    request_headers = dict(headers or {})
+    if meta:
+        if meta.get('etag'):
+            request_headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            request_headers['If-Modified-Since'] = meta['last_modified']
+
+    try:
+        response = http_client.get(url, headers=request_headers, timeout=timeout)
+    except requests.RequestException as e:
+        if meta:
+            print(f"Serving stale cache for {url}: {str(e)}")
+            return CachedResponse(url, 200, body, meta['headers'], from_cache=True)
+        raise
+
+    if response.status_code == 304 and meta:
+        meta['stored_at'] = time.time()
+        _store_entry(url, cache_dir, meta)
+        return CachedResponse(url, 200, body, meta['headers'], from_cache=True)
+
+    if response.status_code == 200:
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified or ttl > 0:
+            _store_entry(url, cache_dir, {
+                'url': url,
+                'stored_at': time.time(),
+                'etag': etag,
+                'last_modified': last_modified,
+                'headers': {'Content-Type': response.headers.get('Content-Type', '')}
+            }, response.content)
+
+    return CachedResponse(url, response.status_code, response.content, dict(response.headers))
@@ -1,8 +1,7 @@
-import runpod
-import requests
 import json
 import os
 from datetime import datetime
+from http_cache import cached_get
 
 # Simple test version - minimal dependencies
 def handler(event):
@@ -28,12 +27,13 @@ def handler(event):
     try:
         # Simple RSS fetch test
         test_url = newsletters[0] + '/feed'
-        response = requests.get(test_url, timeout=10)
+        response = cached_get(test_url, timeout=10, ttl=job_input.get('cache_ttl'))
         
         result = {
             'test_mode': True,
             'rss_fetch_status': response.status_code,
             'rss_content_length': len(response.text) if response.status_code == 200 else 0,
+            'rss_from_cache': response.from_cache,
             'timestamp': datetime.now().isoformat(),
             'next_step': 'RSS fetch working, ready for full implementation'
         }
@@ -57,4 +57,5 @@ def handler(event):
 
 # Start the serverless worker
 if __name__ == '__main__':
+    import runpod
     runpod.serverless.start({'handler': handler})
\ No newline at end of file
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List
+
+# Configuration
+POST_LEDGER_PATH = os.environ.get('POST_LEDGER_PATH', 'data/post_ledger.db')
+
+
+def entry_key(entry) -> str:
+    """Stable identity for a feed entry: its GUID, falling back to the post URL"""
+    return entry.get('id') or entry.get('link', '')
+
+
+def entry_hash(entry) -> str:
+    """Hash of the parts of a feed entry that change when a post is edited"""
+    parts = [entry.get('title', ''), entry.get('summary', ''), entry.get('updated', '')]
+    parts.extend(c.get('value', '') for c in entry.get('content', []) or [])
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+class PostLedger:
+    """Persistent record of which posts (and which versions of them) have been analyzed"""
+
+    def __init__(self, path: str = None):
+        self.path = path or POST_LEDGER_PATH
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen_posts (
+                post_key TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                url TEXT,
+                title TEXT,
+                source TEXT,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def is_new_or_changed(self, post_key: str, content_hash: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM seen_posts WHERE post_key = ?", (post_key,)
+            ).fetchone()
+        return row is None or row[0] != content_hash
+
+    def record(self, posts: List[Dict]):
+        """Mark posts as processed; posts need the 'guid' and 'content_hash' set by the collector"""
+        now = datetime.now().isoformat()
+        rows = [
+            (post['guid'], post['content_hash'], post.get('url'), post.get('title'),
+             post.get('source'), now, now)
+            for post in posts if post.get('guid') and post.get('content_hash')
+        ]
+        with self._lock:
+            self._conn.executemany("""
+                INSERT INTO seen_posts (post_key, content_hash, url, title, source, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(post_key) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    url = excluded.url,
+                    title = excluded.title,
+                    last_seen = excluded.last_seen
+            """, rows)
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
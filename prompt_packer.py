@@ -0,0 +1,111 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List
+
+# Rough English-text ratio; good enough for budgeting without a tokenizer dependency
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or '') + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _published_ts(post: Dict) -> float:
+    published = post.get('published') or ''
+    for parse in (parsedate_to_datetime, datetime.fromisoformat):
+        try:
+            parsed = parse(published)
+        except (TypeError, ValueError, IndexError):
+            continue
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return 0.0
+
+
+def prioritize(posts: List[Dict]) -> List[Dict]:
+    """Order posts newest-first while spreading picks across sources
+
+    Round r takes the r-th newest post of every source, so a prolific newsletter cannot
+    crowd the others out of the budget; within a round, newer posts come first.
+    """
+    by_source = {}
+    for index, post in enumerate(posts):
+        by_source.setdefault(post.get('source', ''), []).append((-_published_ts(post), index, post))
+    for queue in by_source.values():
+        queue.sort(key=lambda item: item[:2])
+
+    ordered = []
+    depth = 0
+    while True:
+        round_items = [queue[depth] for queue in by_source.values() if depth < len(queue)]
+        if not round_items:
+            return ordered
+        ordered.extend(post for _, _, post in sorted(round_items, key=lambda item: item[:2]))
+        depth += 1
+
+
+def _trim(text: str, max_tokens: int) -> str:
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    # Prefer ending on a word boundary when one is reasonably close
+    space = cut.rfind(' ', int(limit * 0.8))
+    return (cut[:space] if space > 0 else cut).rstrip() + '…'
+
+
+def pack_posts(posts: List[Dict], budget_tokens: int, render: Callable[[Dict, str], str],
+               content_field: str = 'full_content', min_content_tokens: int = 60,
+               max_content_tokens: int = None):
+    """Pack post blocks into ``budget_tokens``, returning (text, report)
+
+    ``render(post, content)`` formats one post block. Posts are taken in ``prioritize`` order;
+    if even a minimal excerpt of every post does not fit, the lowest-priority posts are
+    dropped. The remaining budget is then shared water-filling style: short posts keep all
+    their content and long ones are trimmed to a common level.
+    """
+    ordered = prioritize(posts)
+    overheads = [estimate_tokens(render(post, '')) for post in ordered]
+    needs = [estimate_tokens(post.get(content_field) or '') for post in ordered]
+    if max_content_tokens is not None:
+        needs = [min(need, max_content_tokens) for need in needs]
+
+    kept = 0
+    used = 0
+    for overhead, need in zip(overheads, needs):
+        cost = overhead + min(need, min_content_tokens)
+        if used + cost > budget_tokens:
+            break
+        used += cost
+        kept += 1
+
+    fixed = sum(overheads[:kept])
+    low, high = min_content_tokens, max(needs[:kept], default=0)
+    while low < high:
+        level = (low + high + 1) // 2
+        if fixed + sum(min(need, level) for need in needs[:kept]) <= budget_tokens:
+            low = level
+        else:
+            high = level - 1
+    level = low
+
+    blocks, trimmed = [], []
+    for post, need in zip(ordered[:kept], needs[:kept]):
+        content = post.get(content_field) or ''
+        allowed = min(need, level)
+        if estimate_tokens(content) > allowed:
+            trimmed.append({'url': post.get('url'), 'from_tokens': estimate_tokens(content), 'to_tokens': allowed})
+            content = _trim(content, allowed)
+        blocks.append(render(post, content))
+
+    text = ''.join(blocks)
+    report = {
+        'budget_tokens': budget_tokens,
+        'estimated_tokens': estimate_tokens(text),
+        'included': kept,
+        'trimmed': trimmed,
+        'dropped': [{'url': post.get('url'), 'source': post.get('source'), 'guid': post.get('guid')}
+                    for post in ordered[kept:]]
+    }
+    return text, report
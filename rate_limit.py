@@ -0,0 +1,39 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens refill per second up to ``capacity``
+
+    ``reserve`` books tokens immediately and returns how long the caller must wait before
+    using them, so both blocking threads (``acquire``) and asyncio callers (sleeping on the
+    returned delay) can share one bucket. Requests larger than the capacity are allowed
+    through once the bucket is full rather than blocking forever.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, amount: float, burst: float = None):
+        return cls(rate=amount / 60.0, capacity=burst if burst is not None else amount)
+
+    def reserve(self, tokens: float = 1) -> float:
+        tokens = min(float(tokens), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
@@ -1,16 +1,41 @@
-import runpod
-import requests
 import json
 import os
 import time
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Dict, List, Any
-import feedparser
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse
+import http_client
+from html_extract import extract_post_text
+from http_cache import cached_get, fresh_cached
+from llm_cache import get_cache
+from prompt_packer import pack_posts
+from rate_limit import TokenBucket
+from post_ledger import PostLedger, entry_key, entry_hash
 
 # Configuration
 ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
+CLAUDE_MODEL = 'claude-3-sonnet-20240229'
+
+# Ingestion concurrency: total worker threads, in-flight requests per host, and spacing per host
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_PER_HOST_CONCURRENCY = 2
+DEFAULT_HOST_DELAY = 0.5
+
+# Map-reduce analysis: posts per map call, concurrent map calls, and map requests per minute
+DEFAULT_MAP_GROUP_SIZE = 2
+DEFAULT_MAP_CONCURRENCY = 4
+DEFAULT_MAP_REQUESTS_PER_MINUTE = 40
+
+# Estimated tokens of post content packed into a single-call analysis prompt
+DEFAULT_PROMPT_TOKEN_BUDGET = 12000
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; AI Research Bot/1.0)'
+}
 
 # Target AI consciousness researchers and newsletters
 RESEARCH_TARGETS = {
@@ -26,63 +51,136 @@ RESEARCH_TARGETS = {
     'cameron_wolfe': 'https://cameronrwolfe.substack.com'
 }
 
-def extract_substack_content(newsletter_url: str, max_posts: int = 5) -> List[Dict]:
+class HostLimiter:
+    """Per-host politeness: caps in-flight requests and spaces out request starts"""
+
+    def __init__(self, per_host: int = 2, min_interval: float = 1.0):
+        self.per_host = max(1, per_host)
+        self.min_interval = max(0.0, min_interval)
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    @contextmanager
+    def slot(self, url: str):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.Semaphore(self.per_host))
+        with semaphore:
+            # Reserve the next start time for this host, then wait for it outside the lock
+            with self._lock:
+                now = time.monotonic()
+                start_at = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start_at + self.min_interval
+            delay = start_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            yield
+
+def polite_get(url: str, limiter: HostLimiter = None, cache_ttl: int = None):
+    """GET through the HTTP cache, taking a host slot only when the network may be used"""
+    response = fresh_cached(url, ttl=cache_ttl)
+    if response is not None:
+        return response
+    if limiter:
+        with limiter.slot(url):
+            return cached_get(url, headers=REQUEST_HEADERS, timeout=10, ttl=cache_ttl)
+    return cached_get(url, headers=REQUEST_HEADERS, timeout=10, ttl=cache_ttl)
+
+def fetch_feed(newsletter_url: str, max_posts: int, limiter: HostLimiter = None, cache_ttl: int = None):
+    """Fetch a newsletter's RSS feed and return (entries, feed title)"""
+    rss_url = f"{newsletter_url}/feed"
+    response = polite_get(rss_url, limiter, cache_ttl)
+    if response.status_code != 200:
+        raise ValueError(f"feed returned HTTP {response.status_code}")
+    import feedparser  # deferred: slow to import and only needed once a feed arrives
+    feed = feedparser.parse(response.content)
+    return feed.entries[:max_posts], feed.feed.get('title', '')
+
+def build_post(entry, author: str, newsletter_url: str, full_content: str) -> Dict:
+    return {
+        'title': entry.get('title', ''),
+        'url': entry.get('link', ''),
+        'guid': entry_key(entry),
+        'content_hash': entry_hash(entry),
+        'published': entry.get('published', ''),
+        'summary': entry.get('summary', ''),
+        'full_content': full_content,
+        'source': newsletter_url,
+        'author': author,
+        'scraped_at': datetime.now().isoformat()
+    }
+
+def iter_collect_posts(newsletters: List[str], posts_per_newsletter: int,
+                       max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                       per_host: int = DEFAULT_PER_HOST_CONCURRENCY,
+                       host_delay: float = DEFAULT_HOST_DELAY,
+                       cache_ttl: int = None,
+                       ledger: PostLedger = None):
+    """Fetch all feeds and post pages concurrently, yielding (newsletter_url, posts) as each newsletter finishes
+
+    A single bounded thread pool serves both feed and post-page fetches; politeness is enforced
+    per host by HostLimiter rather than by a global sleep. Feeds and pages go through the
+    on-disk HTTP cache, so unchanged content costs a 304 (or nothing, within ``cache_ttl``).
+    When a ledger is given, entries it has already seen unchanged are skipped before scraping.
+    """
+    limiter = HostLimiter(per_host=per_host, min_interval=host_delay)
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        feed_futures = {
+            pool.submit(fetch_feed, url, posts_per_newsletter, limiter, cache_ttl): url
+            for url in newsletters
+        }
+        pending = set(feed_futures)
+        # newsletter_url -> [author, entries, {index: content}]
+        progress = {}
+        post_futures = {}
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in feed_futures:
+                    newsletter_url = feed_futures[future]
+                    try:
+                        entries, author = future.result()
+                    except Exception as e:
+                        print(f"Error extracting from {newsletter_url}: {str(e)}")
+                        entries, author = [], ''
+                    if ledger:
+                        entries = [e for e in entries if ledger.is_new_or_changed(entry_key(e), entry_hash(e))]
+                    progress[newsletter_url] = [author, entries, {}]
+                    for index, entry in enumerate(entries):
+                        post_future = pool.submit(scrape_post_content, entry.get('link', ''), limiter, cache_ttl)
+                        post_futures[post_future] = (newsletter_url, index)
+                        pending.add(post_future)
+                else:
+                    newsletter_url, index = post_futures.pop(future)
+                    progress[newsletter_url][2][index] = future.result()
+
+                author, entries, contents = progress[newsletter_url]
+                if len(contents) == len(entries):
+                    posts = [
+                        build_post(entry, author, newsletter_url, contents[index])
+                        for index, entry in enumerate(entries)
+                    ]
+                    del progress[newsletter_url]
+                    yield newsletter_url, posts
+
+def collect_posts(newsletters: List[str], posts_per_newsletter: int, **kwargs) -> Dict[str, List[Dict]]:
+    """Collect posts from every newsletter concurrently, keyed by newsletter URL in input order"""
+    collected = dict(iter_collect_posts(newsletters, posts_per_newsletter, **kwargs))
+    return {url: collected.get(url, []) for url in newsletters}
+
+def extract_substack_content(newsletter_url: str, max_posts: int = 5, **kwargs) -> List[Dict]:
     """Extract recent posts from Substack using RSS and web scraping"""
-    posts = []
-    
-    try:
-        # Try RSS feed first (most reliable)
-        rss_url = f"{newsletter_url}/feed"
-        feed = feedparser.parse(rss_url)
-        
-        for entry in feed.entries[:max_posts]:
-            # Get full content by scraping the actual post
-            full_content = scrape_post_content(entry.link)
-            
-            post_data = {
-                'title': entry.get('title', ''),
-                'url': entry.get('link', ''),
-                'published': entry.get('published', ''),
-                'summary': entry.get('summary', ''),
-                'full_content': full_content,
-                'source': newsletter_url,
-                'author': feed.feed.get('title', ''),
-                'scraped_at': datetime.now().isoformat()
-            }
-            posts.append(post_data)
-            
-            # Be respectful - small delay between requests
-            time.sleep(1)
-            
-    except Exception as e:
-        print(f"Error extracting from {newsletter_url}: {str(e)}")
-        
-    return posts
+    return collect_posts([newsletter_url], max_posts, **kwargs)[newsletter_url]
 
-def scrape_post_content(post_url: str) -> str:
+def scrape_post_content(post_url: str, limiter: HostLimiter = None, cache_ttl: int = None) -> str:
     """Scrape full content from a Substack post"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (compatible; AI Research Bot/1.0)'
-        }
-        response = requests.get(post_url, headers=headers, timeout=10)
+        response = polite_get(post_url, limiter, cache_ttl)
         
         if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find the main content area (Substack specific)
-            content_div = soup.find('div', class_='post-content')
-            if not content_div:
-                content_div = soup.find('div', class_='available-content')
-            if not content_div:
-                # Fallback to finding paragraphs
-                content_div = soup.find('article')
-                
-            if content_div:
-                # Extract text while preserving structure
-                paragraphs = content_div.find_all(['p', 'h1', 'h2', 'h3', 'blockquote'])
-                content = '\n\n'.join([p.get_text().strip() for p in paragraphs if p.get_text().strip()])
-                return content[:5000]  # Limit length
+            return extract_post_text(response.content, budget=5000)  # Limit length
                 
         return ""
         
@@ -90,88 +188,233 @@ def scrape_post_content(post_url: str) -> str:
         print(f"Error scraping {post_url}: {str(e)}")
         return ""
 
-def analyze_research_intelligence(posts: List[Dict]) -> Dict:
-    """Analyze posts with Claude for research intelligence and story opportunities"""
+ANALYSIS_SECTIONS = """Provide a detailed analysis including:
+
+1. **Key Themes & Trends**: What are the dominant topics and emerging themes?
+
+2. **Story Opportunities**: Specific narrative angles for podcast episodes about AI consciousness and human-AI relationships
+
+3. **Collaboration Targets**: Which authors seem most open to creative storytelling partnerships? Look for:
+   - Personal anecdotes or emotional language
+   - Interest in broader implications beyond technical details
+   - Mentions of uncertainty, wonder, or philosophical questions
+
+4. **Emotional Undertones**: What are the researchers feeling? Excitement, concern, uncertainty?
+
+5. **Connection Mapping**: How do these different researchers' work connect? What conversations could be bridged?
+
+6. **Outreach Insights**: For each author, what specific angle would resonate for podcast collaboration?
+
+7. **Research Gaps**: What questions about AI consciousness are these researchers NOT addressing that could become story topics?
+
+Focus on the human elements and narrative potential, not just technical content.
+"""
+
+def call_claude(prompt: str, max_tokens: int, timeout: int = 60) -> Dict:
+    """Send a single-turn prompt to Claude, answering byte-identical requests from the response cache
+
+    Returns {'text', 'cache_hit'} on success or {'error', 'status_code'} on an API error.
+    """
+    cache = get_cache()
+    cached = cache.get(CLAUDE_MODEL, max_tokens, prompt)
+    if cached is not None:
+        return {'text': cached, 'cache_hit': True}
     
-    if not ANTHROPIC_API_KEY:
-        return {"error": "No Anthropic API key configured"}
+    headers = {
+        'Content-Type': 'application/json',
+        'x-api-key': ANTHROPIC_API_KEY,
+        'anthropic-version': '2023-06-01'
+    }
     
-    # Prepare content for analysis
-    analysis_content = ""
-    for post in posts:
-        analysis_content += f"""
+    payload = {
+        'model': CLAUDE_MODEL,
+        'max_tokens': max_tokens,
+        'messages': [
+            {
+                'role': 'user',
+                'content': prompt
+            }
+        ]
+    }
+    
+    response = http_client.post(
+        'https://api.anthropic.com/v1/messages',
+        headers=headers,
+        json=payload,
+        timeout=timeout
+    )
+    
+    if response.status_code != 200:
+        return {
+            'error': f"Claude API error: {response.status_code} - {response.text}",
+            'status_code': response.status_code
+        }
+    
+    text = response.json()['content'][0]['text']
+    cache.put(CLAUDE_MODEL, max_tokens, prompt, text)
+    return {'text': text, 'cache_hit': False}
+
+def render_analysis_post(post: Dict, content: str) -> str:
+    also_covered = ''
+    if post.get('duplicates'):
+        also_covered = 'Also covered by: ' + ', '.join(d.get('url') or d.get('source', '') for d in post['duplicates']) + '\n'
+    return f"""
 === POST ===
 Author: {post['author']}
 Title: {post['title']}
 URL: {post['url']}
 Published: {post['published']}
-Content: {post['full_content'][:2000]}...
+Content: {content}...
 Source: {post['source']}
-
+{also_covered}
 """
+
+def drop_near_duplicate_posts(posts: List[Dict]) -> List[Dict]:
+    """Keep one post per near-duplicate story; each keeps the others' provenance under 'duplicates'"""
+    from agents.scripts.near_dup import dedupe
+    return dedupe(
+        posts,
+        "research",
+        key=lambda post: f"post:{post.get('guid') or post['url']}",
+        text=lambda post: f"{post['title']}\n{post.get('full_content') or post.get('summary', '')}",
+        meta=lambda post: {'source': post['source'], 'url': post['url'], 'title': post['title'],
+                           'author': post.get('author')}
+    )
+
+def analyze_research_intelligence(posts: List[Dict], token_budget: int = DEFAULT_PROMPT_TOKEN_BUDGET) -> Dict:
+    """Analyze posts with Claude for research intelligence and story opportunities"""
+    
+    if not ANTHROPIC_API_KEY:
+        return {"error": "No Anthropic API key configured"}
+    
+    # Pack the newest posts from as many sources as possible into the token budget
+    analysis_content, packing = pack_posts(posts, token_budget, render_analysis_post)
+    if not packing['included']:
+        return {"error": f"No post fits in the {token_budget}-token prompt budget", 'prompt_packing': packing}
+    dropped = {d['guid'] for d in packing['dropped']}
+    included = [post for post in posts if post.get('guid') not in dropped]
     
     analysis_prompt = f"""
 You are an expert at identifying storytelling opportunities and collaboration potential in AI consciousness research. Analyze these newsletter posts for "The Papers That Dream" podcast.
 
 {analysis_content}
 
-Provide a detailed analysis including:
-
-1. **Key Themes & Trends**: What are the dominant topics and emerging themes?
+{ANALYSIS_SECTIONS}"""
+    
+    try:
+        reply = call_claude(analysis_prompt, max_tokens=3000)
+        if 'error' in reply:
+            return {"error": reply['error']}
+        return {
+            'research_intelligence': reply['text'],
+            'analysis_timestamp': datetime.now().isoformat(),
+            'posts_analyzed': packing['included'],
+            'sources_covered': list(set([post['source'] for post in included])),
+            'cache_hit': reply['cache_hit'],
+            'prompt_packing': packing
+        }
+            
+    except Exception as e:
+        return {"error": f"Analysis error: {str(e)}"}
 
-2. **Story Opportunities**: Specific narrative angles for podcast episodes about AI consciousness and human-AI relationships
+def summarize_posts(posts: List[Dict]) -> Dict:
+    """Map step: condense a small group of posts into notes for the final synthesis"""
+    
+    posts_content = ""
+    for post in posts:
+        posts_content += f"""
+=== POST ===
+Author: {post['author']}
+Title: {post['title']}
+URL: {post['url']}
+Published: {post['published']}
+Content: {post['full_content']}
+Source: {post['source']}
 
-3. **Collaboration Targets**: Which authors seem most open to creative storytelling partnerships? Look for:
-   - Personal anecdotes or emotional language
-   - Interest in broader implications beyond technical details
-   - Mentions of uncertainty, wonder, or philosophical questions
+"""
+    
+    summary_prompt = f"""
+You are preparing research notes for "The Papers That Dream", a podcast about AI consciousness and human-AI relationships. Summarize each of these newsletter posts for a later synthesis step.
 
-4. **Emotional Undertones**: What are the researchers feeling? Excitement, concern, uncertainty?
+{posts_content}
 
-5. **Connection Mapping**: How do these different researchers' work connect? What conversations could be bridged?
+For each post, keep the author, title and URL, then note in a few sentences:
+- The main argument and any emerging themes
+- Possible story angles for the podcast
+- Personal anecdotes, emotional language, uncertainty or philosophical questions
+- Signals that the author might be open to creative collaboration
+- Questions about AI consciousness the post raises but does not answer
 
-6. **Outreach Insights**: For each author, what specific angle would resonate for podcast collaboration?
+Be concise and concrete; quote short phrases where they capture the author's voice.
+"""
+    
+    reply = call_claude(summary_prompt, max_tokens=800)
+    if 'error' in reply:
+        return {"error": reply['error']}
+    return {'summary': reply['text'], 'cache_hit': reply['cache_hit']}
 
-7. **Research Gaps**: What questions about AI consciousness are these researchers NOT addressing that could become story topics?
+def analyze_research_intelligence_map_reduce(posts: List[Dict],
+                                             group_size: int = DEFAULT_MAP_GROUP_SIZE,
+                                             max_concurrency: int = DEFAULT_MAP_CONCURRENCY,
+                                             requests_per_minute: int = DEFAULT_MAP_REQUESTS_PER_MINUTE) -> Dict:
+    """Analyze posts in two stages: summarize groups of posts in parallel, then synthesize one report
 
-Focus on the human elements and narrative potential, not just technical content.
+    Each post is read in full (no 2000-char cut) by a map call, and the reduce call only sees
+    the summaries, so the post count is no longer bounded by a single prompt's context window.
+    Map calls share a token bucket so a large sweep cannot burst past the API rate limit.
+    """
+    
+    if not ANTHROPIC_API_KEY:
+        return {"error": "No Anthropic API key configured"}
+    
+    group_size = max(1, group_size)
+    groups = [posts[i:i + group_size] for i in range(0, len(posts), group_size)]
+    bucket = TokenBucket.per_minute(requests_per_minute, burst=max_concurrency)
+    
+    def run_map(group):
+        bucket.acquire()
+        try:
+            return summarize_posts(group)
+        except Exception as e:
+            return {"error": f"Map error: {str(e)}"}
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        map_results = list(pool.map(run_map, groups))
+    
+    summaries = [r['summary'] for r in map_results if 'summary' in r]
+    map_errors = [r['error'] for r in map_results if 'error' in r]
+    if not summaries:
+        return {"error": f"All {len(groups)} map calls failed: {map_errors[:3]}"}
+    
+    notes_content = ""
+    for i, summary in enumerate(summaries):
+        notes_content += f"""
+=== NOTES {i + 1} ===
+{summary}
 """
     
+    reduce_prompt = f"""
+You are an expert at identifying storytelling opportunities and collaboration potential in AI consciousness research. Below are research notes on {len(posts)} newsletter posts, prepared for "The Papers That Dream" podcast.
+
+{notes_content}
+
+{ANALYSIS_SECTIONS}"""
+    
     try:
-        headers = {
-            'Content-Type': 'application/json',
-            'x-api-key': ANTHROPIC_API_KEY,
-            'anthropic-version': '2023-06-01'
-        }
-        
-        payload = {
-            'model': 'claude-3-sonnet-20240229',
-            'max_tokens': 3000,
-            'messages': [
-                {
-                    'role': 'user',
-                    'content': analysis_prompt
-                }
-            ]
+        reply = call_claude(reduce_prompt, max_tokens=3000, timeout=120)
+        if 'error' in reply:
+            return {"error": reply['error']}
+        return {
+            'research_intelligence': reply['text'],
+            'analysis_timestamp': datetime.now().isoformat(),
+            'posts_analyzed': len(posts),
+            'sources_covered': list(set([post['source'] for post in posts])),
+            'cache_hit': reply['cache_hit'],
+            'analysis_mode': 'map_reduce',
+            'map_calls': len(groups),
+            'map_cache_hits': sum(1 for r in map_results if r.get('cache_hit')),
+            'map_errors': map_errors
         }
-        
-        response = requests.post(
-            'https://api.anthropic.com/v1/messages',
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return {
-                'research_intelligence': result['content'][0]['text'],
-                'analysis_timestamp': datetime.now().isoformat(),
-                'posts_analyzed': len(posts),
-                'sources_covered': list(set([post['source'] for post in posts]))
-            }
-        else:
-            return {"error": f"Claude API error: {response.status_code} - {response.text}"}
             
     except Exception as e:
         return {"error": f"Analysis error: {str(e)}"}
@@ -207,87 +450,184 @@ Make each approach feel like a genuine creative collaboration opportunity.
 """
     
     try:
-        headers = {
-            'Content-Type': 'application/json',
-            'x-api-key': ANTHROPIC_API_KEY,
-            'anthropic-version': '2023-06-01'
+        reply = call_claude(strategy_prompt, max_tokens=2500)
+        if 'error' in reply:
+            return {"error": f"Strategy generation error: {reply['status_code']}"}
+        return {
+            'outreach_strategy': reply['text'],
+            'strategy_timestamp': datetime.now().isoformat(),
+            'cache_hit': reply['cache_hit']
         }
-        
-        payload = {
-            'model': 'claude-3-sonnet-20240229',
-            'max_tokens': 2500,
-            'messages': [
-                {
-                    'role': 'user',
-                    'content': strategy_prompt
-                }
-            ]
-        }
-        
-        response = requests.post(
-            'https://api.anthropic.com/v1/messages',
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return {
-                'outreach_strategy': result['content'][0]['text'],
-                'strategy_timestamp': datetime.now().isoformat()
-            }
-        else:
-            return {"error": f"Strategy generation error: {response.status_code}"}
             
     except Exception as e:
         return {"error": f"Strategy error: {str(e)}"}
 
-def handler(event):
-    """Main handler for RunPod serverless"""
-    
-    job_input = event.get('input', {})
+def run_research(job_input: Dict):
+    """Run a research job as a sequence of stage events
+
+    Yields {'type': 'newsletter'} as soon as each newsletter's posts are scraped, then
+    {'type': 'analysis'}, optionally {'type': 'outreach'}, and finally {'type': 'complete'}.
+    Sharded sweeps use two extra inputs: 'collect_only' stops after scraping, and 'posts'
+    analyzes posts collected by earlier jobs instead of scraping. With 'incremental', posts
+    passed in are checked against this worker's ledger, which records them once analyzed.
+    """
     
     # Configuration from input
-    newsletters = job_input.get('newsletters', list(RESEARCH_TARGETS.values()))
+    provided_posts = job_input.get('posts')
+    collect_only = job_input.get('collect_only', False)
+    default_newsletters = list(RESEARCH_TARGETS.values())
+    if provided_posts is not None:
+        default_newsletters = list(dict.fromkeys(post['source'] for post in provided_posts))
+    newsletters = job_input.get('newsletters', default_newsletters)
     posts_per_newsletter = job_input.get('posts_per_newsletter', 3)
     include_outreach_strategy = job_input.get('include_outreach_strategy', True)
+    max_concurrency = int(job_input.get('max_concurrency', DEFAULT_MAX_CONCURRENCY))
+    per_host = int(job_input.get('per_host_concurrency', DEFAULT_PER_HOST_CONCURRENCY))
+    host_delay = float(job_input.get('host_delay', DEFAULT_HOST_DELAY))
+    cache_ttl = job_input.get('cache_ttl')  # seconds; None uses HTTP_CACHE_TTL
+    incremental = job_input.get('incremental', False)
+    force_full = job_input.get('force_full', False)  # re-run everything but still refresh the ledger
+    analysis_mode = job_input.get('analysis_mode', 'single')  # 'single' or 'map_reduce'
+    dedupe = job_input.get('dedupe', False)  # analyze one post per near-duplicate story
+    
+    ledger = PostLedger() if incremental else None
     
-    print(f"🔍 Starting research intelligence collection...")
-    print(f"📊 Targeting {len(newsletters)} newsletters, {posts_per_newsletter} posts each")
+    if provided_posts is not None:
+        print(f"📥 Received {len(provided_posts)} pre-collected posts")
+        all_posts = provided_posts
+        if ledger and not force_full:
+            # Collectors may have run on workers with other ledgers; this job's ledger decides
+            all_posts = [post for post in provided_posts
+                         if ledger.is_new_or_changed(post.get('guid', ''), post.get('content_hash', ''))]
+    else:
+        print(f"🔍 Starting research intelligence collection...")
+        print(f"📊 Targeting {len(newsletters)} newsletters, {posts_per_newsletter} posts each "
+              f"(concurrency {max_concurrency}, {per_host}/host)")
+        
+        # Collect posts from all newsletters concurrently
+        collected = {}
+        for newsletter_url, posts in iter_collect_posts(newsletters, posts_per_newsletter,
+                                                        max_concurrency=max_concurrency,
+                                                        per_host=per_host,
+                                                        host_delay=host_delay,
+                                                        cache_ttl=cache_ttl,
+                                                        ledger=None if force_full else ledger):
+            collected[newsletter_url] = posts
+            print(f"✅ {newsletter_url}: found {len(posts)} posts")
+            yield {'type': 'newsletter', 'newsletter': newsletter_url, 'posts': posts}
+        
+        # Keep the report in the order the newsletters were requested
+        all_posts = [post for url in newsletters for post in collected.get(url, [])]
+        
+        if collect_only:
+            # The ledger is updated by whichever job analyzes these posts
+            if ledger:
+                ledger.close()
+            yield {'type': 'complete', 'posts_collected': len(all_posts),
+                   'newsletters_scanned': len(newsletters), 'generated_at': datetime.now().isoformat()}
+            return
     
-    all_posts = []
+    if ledger and not all_posts:
+        print(f"💤 No new or changed posts since the last sweep")
+        ledger.close()
+        yield {'type': 'analysis',
+               'research_intelligence': {'message': 'No new or changed posts since the last sweep'}}
+        yield {'type': 'complete', 'posts_collected': 0, 'newsletters_scanned': len(newsletters),
+               'generated_at': datetime.now().isoformat()}
+        return
     
-    # Collect posts from each newsletter
-    for newsletter_url in newsletters:
-        print(f"📰 Extracting from: {newsletter_url}")
-        posts = extract_substack_content(newsletter_url, posts_per_newsletter)
-        all_posts.extend(posts)
-        print(f"✅ Found {len(posts)} posts")
+    analysis_posts = all_posts
+    if dedupe:
+        analysis_posts = drop_near_duplicate_posts(all_posts)
+        print(f"🧬 {len(all_posts) - len(analysis_posts)} near-duplicate posts folded into their representatives")
+        if not analysis_posts:
+            # Nothing was analyzed, so nothing is recorded in the ledger either
+            if ledger:
+                ledger.close()
+            yield {'type': 'analysis',
+                   'research_intelligence': {'message': 'All posts are near-duplicates of stories already analyzed'}}
+            yield {'type': 'complete', 'posts_collected': len(all_posts), 'newsletters_scanned': len(newsletters),
+                   'generated_at': datetime.now().isoformat()}
+            return
     
-    print(f"🧠 Analyzing {len(all_posts)} posts with Claude...")
+    print(f"🧠 Analyzing {len(analysis_posts)} posts with Claude ({analysis_mode})...")
     
     # Analyze with Claude for research intelligence
-    intelligence_analysis = analyze_research_intelligence(all_posts)
+    if analysis_mode == 'map_reduce':
+        intelligence_analysis = analyze_research_intelligence_map_reduce(
+            analysis_posts,
+            group_size=int(job_input.get('map_group_size', DEFAULT_MAP_GROUP_SIZE)),
+            max_concurrency=int(job_input.get('map_concurrency', DEFAULT_MAP_CONCURRENCY)),
+            requests_per_minute=int(job_input.get('map_requests_per_minute', DEFAULT_MAP_REQUESTS_PER_MINUTE))
+        )
+    else:
+        intelligence_analysis = analyze_research_intelligence(
+            analysis_posts,
+            token_budget=int(job_input.get('prompt_token_budget', DEFAULT_PROMPT_TOKEN_BUDGET))
+        )
+        packing = intelligence_analysis.get('prompt_packing')
+        if packing and (packing['dropped'] or packing['trimmed']):
+            print(f"✂️ Packed {packing['included']} posts into ~{packing['estimated_tokens']} tokens "
+                  f"({len(packing['trimmed'])} trimmed, {len(packing['dropped'])} dropped)")
     
-    result = {
-        'posts_collected': len(all_posts),
-        'newsletters_scanned': len(newsletters),
-        'posts': all_posts,
-        'research_intelligence': intelligence_analysis,
-        'generated_at': datetime.now().isoformat()
-    }
+    # Only remember posts once they have actually been analyzed, so failed runs are retried,
+    # and leave out posts the prompt budget dropped so the next sweep picks them up
+    if ledger:
+        if 'error' not in intelligence_analysis:
+            packing = intelligence_analysis.get('prompt_packing') or {}
+            dropped = {d['guid'] for d in packing.get('dropped', [])}
+            ledger.record([post for post in all_posts if post.get('guid') not in dropped])
+        ledger.close()
+    
+    yield {'type': 'analysis', 'research_intelligence': intelligence_analysis}
     
     # Generate outreach strategy if requested
     if include_outreach_strategy and 'error' not in intelligence_analysis:
         print(f"📧 Generating outreach strategies...")
-        outreach_strategy = generate_outreach_strategy(intelligence_analysis)
-        result['outreach_strategy'] = outreach_strategy
+        yield {'type': 'outreach', 'outreach_strategy': generate_outreach_strategy(intelligence_analysis)}
     
     print(f"✨ Research intelligence complete!")
     
+    yield {
+        'type': 'complete',
+        'posts_collected': len(all_posts),
+        'newsletters_scanned': len(newsletters),
+        'generated_at': datetime.now().isoformat(),
+        'llm_cache': get_cache().stats()
+    }
+
+def handler(event):
+    """Main handler for RunPod serverless"""
+    
+    job_input = event.get('input', {})
+    newsletters = job_input.get('newsletters', list(RESEARCH_TARGETS.values()))
+    
+    collected = {}
+    result = {}
+    for stage in run_research(job_input):
+        if stage['type'] == 'newsletter':
+            collected[stage['newsletter']] = stage['posts']
+        elif stage['type'] == 'analysis':
+            result['research_intelligence'] = stage['research_intelligence']
+        elif stage['type'] == 'outreach':
+            result['outreach_strategy'] = stage['outreach_strategy']
+        else:
+            result.update({k: v for k, v in stage.items() if k != 'type'})
+    
+    if 'posts' in job_input:
+        result['posts'] = job_input['posts']
+    else:
+        result['posts'] = [post for url in newsletters for post in collected.get(url, [])]
     return result
 
-# Start the serverless worker
+def stream_handler(event):
+    """Generator handler for RunPod serverless: results are available on /stream as each stage finishes"""
+    yield from run_research(event.get('input', {}))
+
+# Start the serverless worker; RESEARCH_STREAMING=1 serves the generator handler instead
 if __name__ == '__main__':
-    runpod.serverless.start({'handler': handler})
\ No newline at end of file
+    import runpod
+    if os.environ.get('RESEARCH_STREAMING', '').lower() in ('1', 'true', 'yes'):
+        runpod.serverless.start({'handler': stream_handler, 'return_aggregate_stream': True})
+    else:
+        runpod.serverless.start({'handler': handler})
@@ -1,13 +1,17 @@
-import runpod
-import requests
 import json
 import os
 from datetime import datetime
-import re
+import xml.etree.ElementTree as ET
 from typing import Dict, List, Any
+import http_client
+from http_cache import cached_get
+from llm_cache import get_cache
+from prompt_packer import pack_posts
 
 # Configuration
 ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
+CLAUDE_MODEL = 'claude-3-sonnet-20240229'
+DEFAULT_PROMPT_TOKEN_BUDGET = 6000
 SUBSTACK_ENDPOINTS = [
     'https://magazine.sebastianraschka.com',
     'https://www.understandingai.org',
@@ -18,37 +22,67 @@ SUBSTACK_ENDPOINTS = [
     'https://newsletter.towardsai.net'
 ]
 
+FEED_CHUNK_SIZE = 64 * 1024
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+def _child_text(elem, name: str) -> str:
+    for child in elem:
+        if _local_name(child.tag) == name:
+            return (child.text or '').strip()
+    return ''
+
+def iter_feed_items(chunks, limit: int = None):
+    """Incrementally parse RSS bytes, yielding one item at a time
+
+    Only <item> elements are read, so the channel's own <title>/<link> never shift the
+    fields out of alignment. Each item is cleared once yielded, and parsing stops as soon
+    as ``limit`` items have been produced.
+    """
+    if limit is not None and limit <= 0:
+        return
+    parser = ET.XMLPullParser(events=('end',))
+    count = 0
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            for _, elem in parser.read_events():
+                if _local_name(elem.tag) != 'item':
+                    continue
+                yield {
+                    'title': _child_text(elem, 'title'),
+                    'url': _child_text(elem, 'link'),
+                    'excerpt': _child_text(elem, 'description'),
+                    'published': _child_text(elem, 'pubDate')
+                }
+                elem.clear()
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+    except ET.ParseError as e:
+        print(f"Feed parse stopped early: {str(e)}")
+
+def _iter_chunks(content: bytes, size: int = FEED_CHUNK_SIZE):
+    for offset in range(0, len(content), size):
+        yield content[offset:offset + size]
+
 def extract_substack_posts(newsletter_url: str, limit: int = 5) -> List[Dict]:
     """Extract recent posts from a Substack newsletter"""
     try:
         # Try to get RSS feed first (most reliable)
         rss_url = f"{newsletter_url}/feed"
-        response = requests.get(rss_url, timeout=10)
+        response = cached_get(rss_url, timeout=10)
         
         if response.status_code == 200:
-            # Parse RSS (simplified - in production we'd use feedparser)
-            content = response.text
-            
-            # Extract post data using regex (basic implementation)
             posts = []
-            # This is a simplified parser - in production we'd use proper RSS parsing
-            title_pattern = r'<title><!\[CDATA\[(.*?)\]\]></title>'
-            link_pattern = r'<link>(.*?)</link>'
-            description_pattern = r'<description><!\[CDATA\[(.*?)\]\]></description>'
-            
-            titles = re.findall(title_pattern, content)
-            links = re.findall(link_pattern, content)
-            descriptions = re.findall(description_pattern, content)
-            
-            for i in range(min(limit, len(titles))):
-                if i < len(titles) and i < len(links):
-                    posts.append({
-                        'title': titles[i],
-                        'url': links[i],
-                        'excerpt': descriptions[i] if i < len(descriptions) else '',
+            for item in iter_feed_items(_iter_chunks(response.content), limit):
+                if item['title'] and item['url']:
+                    item.update({
                         'source': newsletter_url,
                         'scraped_at': datetime.now().isoformat()
                     })
+                    posts.append(item)
             
             return posts
         else:
@@ -58,18 +92,22 @@ def extract_substack_posts(newsletter_url: str, limit: int = 5) -> List[Dict]:
         print(f"Error scraping {newsletter_url}: {str(e)}")
         return []
 
-def analyze_posts_with_claude(posts: List[Dict]) -> Dict:
+def render_excerpt(post: Dict, excerpt: str) -> str:
+    return (f"Title: {post['title']}\n"
+            f"Source: {post['source']}\n"
+            f"Excerpt: {excerpt}...\n\n")
+
+def analyze_posts_with_claude(posts: List[Dict], token_budget: int = DEFAULT_PROMPT_TOKEN_BUDGET) -> Dict:
     """Analyze posts using Claude API for research intelligence"""
     
     if not ANTHROPIC_API_KEY:
         return {"error": "No Anthropic API key configured"}
     
-    # Prepare content for analysis
-    content_summary = ""
-    for post in posts:
-        content_summary += f"Title: {post['title']}\n"
-        content_summary += f"Source: {post['source']}\n"
-        content_summary += f"Excerpt: {post['excerpt'][:500]}...\n\n"
+    # Prepare content for analysis, packed into the token budget
+    content_summary, packing = pack_posts(posts, token_budget, render_excerpt,
+                                          content_field='excerpt', max_content_tokens=250)
+    if not packing['included']:
+        return {"error": f"No post fits in the {token_budget}-token prompt budget", 'prompt_packing': packing}
     
     analysis_prompt = f"""
     Analyze these AI consciousness/research newsletter posts for storytelling and collaboration opportunities:
@@ -87,6 +125,17 @@ def analyze_posts_with_claude(posts: List[Dict]) -> Dict:
     Focus on finding the human stories behind the technical content.
     """
     
+    cache = get_cache()
+    cached = cache.get(CLAUDE_MODEL, 2000, analysis_prompt)
+    if cached is not None:
+        return {
+            'analysis': cached,
+            'timestamp': datetime.now().isoformat(),
+            'posts_analyzed': packing['included'],
+            'cache_hit': True,
+            'prompt_packing': packing
+        }
+    
     try:
         headers = {
             'Content-Type': 'application/json',
@@ -95,7 +144,7 @@ def analyze_posts_with_claude(posts: List[Dict]) -> Dict:
         }
         
         payload = {
-            'model': 'claude-3-sonnet-20240229',
+            'model': CLAUDE_MODEL,
             'max_tokens': 2000,
             'messages': [
                 {
@@ -105,7 +154,7 @@ def analyze_posts_with_claude(posts: List[Dict]) -> Dict:
             ]
         }
         
-        response = requests.post(
+        response = http_client.post(
             'https://api.anthropic.com/v1/messages',
             headers=headers,
             json=payload,
@@ -114,10 +163,13 @@ def analyze_posts_with_claude(posts: List[Dict]) -> Dict:
         
         if response.status_code == 200:
             result = response.json()
+            cache.put(CLAUDE_MODEL, 2000, analysis_prompt, result['content'][0]['text'])
             return {
                 'analysis': result['content'][0]['text'],
                 'timestamp': datetime.now().isoformat(),
-                'posts_analyzed': len(posts)
+                'posts_analyzed': packing['included'],
+                'cache_hit': False,
+                'prompt_packing': packing
             }
         else:
             return {"error": f"Claude API error: {response.status_code}"}
@@ -131,6 +183,7 @@ def collect_research_intelligence(event: Dict) -> Dict:
     # Get parameters from the event
     newsletters = event.get('newsletters', SUBSTACK_ENDPOINTS)
     posts_per_newsletter = event.get('posts_per_newsletter', 3)
+    token_budget = int(event.get('prompt_token_budget', DEFAULT_PROMPT_TOKEN_BUDGET))
     
     all_posts = []
     
@@ -142,7 +195,7 @@ def collect_research_intelligence(event: Dict) -> Dict:
     
     # Analyze with Claude
     print(f"Analyzing {len(all_posts)} posts with Claude...")
-    analysis = analyze_posts_with_claude(all_posts)
+    analysis = analyze_posts_with_claude(all_posts, token_budget)
     
     return {
         'statusCode': 200,
@@ -167,5 +220,7 @@ def handler(event):
             }
         }
 
-# Initialize RunPod serverless
-runpod.serverless.start({"handler": handler})
\ No newline at end of file
+# Initialize RunPod serverless (only when run as the worker, not when imported)
+if __name__ == '__main__':
+    import runpod
+    runpod.serverless.start({"handler": handler})
\ No newline at end of file